@@ -1,6 +1,21 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class ForumConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'forum'
+
+    def ready(self):
+        from . import db  # noqa: F401
+        post_migrate.connect(create_search_index, sender=self)
+
+
+def create_search_index(**kwargs):
+    """Create the index and rebuild it when posts or comments are missing, bulk inserts never send signals"""
+    from . import search
+    if search.available():
+        search.create_index()
+        if search.incomplete():
+            search.create_index(drop=True)
+            search.fill()
@@ -0,0 +1,10 @@
+from django.utils.functional import SimpleLazyObject
+
+from . import navbar as navbar_summary
+
+
+def navbar(request):
+    """``navbar`` summary of the logged in user, read from the cache only when a template uses it"""
+    return {'navbar': SimpleLazyObject(
+        lambda: navbar_summary.summary(request.user) if request.user.is_authenticated else {}
+    )}
@@ -0,0 +1,100 @@
+"""
+Unread notification counters kept in the cache.
+
+Message notifications are counted per user. Forum notifications are broadcast,
+so the cache keeps one global total and, per user, the total they have already seen.
+Every counter self-heals from the database on a cache miss.
+"""
+from django.core.cache import cache
+from django.db import transaction
+
+from . import navbar, outbox
+
+COUNTER_TIMEOUT = 10 * 60
+FORUM_TOTAL_KEY = 'unread-forum-total'
+
+
+def forum_seen_key(user_id: int):
+    return f'unread-forum-seen-{user_id}'
+
+
+def message_unread_key(user_id: int):
+    return f'unread-message-{user_id}'
+
+
+def forum_total():
+    from .models import Notification
+    total = cache.get(FORUM_TOTAL_KEY)
+    if total is None:
+        total = Notification.objects.filter(type='forum', user__isnull=True).count()
+        cache.set(FORUM_TOTAL_KEY, total, COUNTER_TIMEOUT)
+    return total
+
+
+def forum_unread(user) -> int:
+    total = forum_total()
+    seen = cache.get(forum_seen_key(user.id))
+    if seen is None:
+        unread = user.forum_notification.count()
+        cache.set(forum_seen_key(user.id), total - unread, COUNTER_TIMEOUT)
+        return unread
+    return max(total - seen, 0)
+
+
+def message_unread(user) -> int:
+    unread = cache.get(message_unread_key(user.id))
+    if unread is None:
+        unread = user.message_notification.count()
+        cache.set(message_unread_key(user.id), unread, COUNTER_TIMEOUT)
+    return unread
+
+
+def unread_counts(user) -> dict:
+    return {'forum': forum_unread(user), 'message': message_unread(user)}
+
+
+def _incr(key: str):
+    try:
+        cache.incr(key)
+    except ValueError:
+        ...  # Not cached yet, will be counted from the database on the next read
+
+
+def bump_forum():
+    """Count a new forum notification once the transaction creating it commits"""
+    transaction.on_commit(lambda: _incr(FORUM_TOTAL_KEY))
+
+
+def bump_message(user_id: int):
+    """Count a new message notification of user once the transaction creating it commits"""
+    def bump():
+        _incr(message_unread_key(user_id))
+        navbar.invalidate(user_id)
+
+    transaction.on_commit(bump)
+
+
+def reset_forum(user):
+    cache.set(forum_seen_key(user.id), forum_total(), COUNTER_TIMEOUT)
+    navbar.invalidate(user.id)
+    push_unread(user)
+
+
+def reset_message(user):
+    cache.set(message_unread_key(user.id), 0, COUNTER_TIMEOUT)
+    navbar.invalidate(user.id)
+    push_unread(user)
+
+
+def push_unread(user):
+    """Ask user's notification consumers to send fresh counters"""
+    from ws.base import user_group_name, ActionSystem
+    from ws.presence import presence
+    if not presence.should_send('notifications', user.id):
+        return
+    outbox.publish(
+        'notifications', user_group_name('notifications', user.id),
+        {'type': 'notification.counters',
+         'params': {'to_user_id': user.id},
+         'system': ActionSystem().to_data()}
+    )
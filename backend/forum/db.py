@@ -0,0 +1,18 @@
+"""
+Health checks of persistent database connections.
+
+Django before 4.1 ignores ``CONN_HEALTH_CHECKS``: a connection kept by ``CONN_MAX_AGE`` that the database server
+closed fails the next request. It is checked before the first query of every request instead.
+"""
+import django
+from django.core.signals import request_started
+from django.db import connections
+from django.dispatch import receiver
+
+if django.VERSION < (4, 1):
+    @receiver(request_started)
+    def connection_health_checks(**kwargs):
+        for connection in connections.all():
+            if connection.settings_dict.get('CONN_HEALTH_CHECKS') and connection.connection is not None \
+                    and not connection.is_usable():
+                connection.close()
@@ -0,0 +1,37 @@
+import os
+import tempfile
+from contextlib import contextmanager
+from importlib import import_module
+
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY, BACKEND_SESSION_KEY, HASH_SESSION_KEY
+from django.db import connection
+
+
+@contextmanager
+def test_database():
+    """Throwaway database of the configured backend, file based for SQLite so every thread shares it"""
+    with tempfile.TemporaryDirectory() as directory:
+        if connection.vendor == 'sqlite':
+            connection.settings_dict['TEST']['NAME'] = os.path.join(directory, 'test.sqlite3')
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            yield
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+def percentile(values: list, p: float) -> float:
+    """Value at fraction p of sorted values"""
+    return values[min(len(values) - 1, int(len(values) * p))] if values else 0
+
+
+def session_cookie(user) -> bytes:
+    """Cookie header of a new session logged in as user, same as ``django.contrib.auth.login`` stores"""
+    session = import_module(settings.SESSION_ENGINE).SessionStore()
+    session[SESSION_KEY] = user._meta.pk.value_to_string(user)
+    session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+    session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+    session.create()
+    return f'{settings.SESSION_COOKIE_NAME}={session.session_key}'.encode()
@@ -0,0 +1,51 @@
+import json
+import timeit
+
+from django.core.management.base import BaseCommand
+
+from ws.base import Action, ActionSystem, JsonCodec, MsgpackCodec, json_codec, orjson
+
+
+class StdlibJsonCodec(JsonCodec):
+    """Previous wire format, ``json.dumps`` with default separators"""
+
+    def encode(self, data) -> str:
+        return json.dumps(data)
+
+    def decode(self, frame):
+        return json.loads(frame)
+
+
+class Command(BaseCommand):
+    help = 'Compare encode/decode cost and frame size of websocket codecs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--number', type=int, default=100000)
+
+    def handle(self, *args, **options):
+        system = ActionSystem(initiator_channel='specific.inmemory!bench', initiator_user_id=1)
+        actions = {
+            'message_show': Action(event='message_show', system=system, params={
+                'content': 'Hello! Are we still meeting tomorrow at the campus?', 'to_user_id': 42,
+                'time': '09:41 p.m.'
+            }),
+            'post_created_notification': Action(event='post_created_notification', system=system, params={
+                'title': 'Rush01 review schedule', 'counters': {'forum': 3, 'message': 12}
+            }),
+        }
+        codecs = {
+            'json (stdlib)': StdlibJsonCodec(),
+            f'json ({"orjson" if orjson else "compact stdlib"})': json_codec,
+            'msgpack': MsgpackCodec(),
+        }
+        number = options['number']
+        self.stdout.write(f'{"action":<28}{"codec":<24}{"encode us":>10}{"decode us":>10}{"bytes":>7}')
+        for name, action in actions.items():
+            data = action.to_data()
+            data.pop('system')
+            for codec_name, codec in codecs.items():
+                frame = codec.encode(data)
+                encode = timeit.timeit(lambda: codec.encode(data), number=number) / number * 1e6
+                decode = timeit.timeit(lambda: codec.decode(frame), number=number) / number * 1e6
+                size = len(frame.encode() if isinstance(frame, str) else frame)
+                self.stdout.write(f'{name:<28}{codec_name:<24}{encode:>10.2f}{decode:>10.2f}{size:>7}')
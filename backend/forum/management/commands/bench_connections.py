@@ -0,0 +1,104 @@
+import asyncio
+import time
+import tracemalloc
+
+from channels.layers import get_channel_layer
+from channels.testing import WebsocketCommunicator
+from django.core.management.base import BaseCommand
+
+from forum.models import User
+from ws.base import BaseConsumer, AsyncBaseConsumer, TargetsEnum, Action, ActionSystem, auth
+
+
+class SyncBenchConsumer(BaseConsumer):
+    broadcast_group = 'bench'
+    channel_layer_alias = 'notifications'
+
+    @auth
+    def connect(self):
+        super(SyncBenchConsumer, self).connect()
+
+    def post_created_notification(self, event):
+        def action_for_target(message, payload):
+            return Action(event='post_created_notification', system=event['system'], params=payload.to_data())
+
+        self.send_broadcast(event, action_for_target=action_for_target, target=TargetsEnum.for_all)
+
+
+class AsyncBenchConsumer(AsyncBaseConsumer):
+    broadcast_group = 'bench'
+    channel_layer_alias = 'notifications'
+
+    @auth
+    async def connect(self):
+        await super(AsyncBenchConsumer, self).connect()
+
+    async def post_created_notification(self, event):
+        async def action_for_target(message, payload):
+            return Action(event='post_created_notification', system=event['system'], params=payload.to_data())
+
+        await self.send_broadcast(event, action_for_target=action_for_target, target=TargetsEnum.for_all)
+
+
+class Command(BaseCommand):
+    help = 'Compare sync BaseConsumer and AsyncBaseConsumer: connections per process, fan-out time and memory'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--connections', type=int, nargs='+', default=[100, 1000])
+        parser.add_argument('--timeout', type=float, default=10)
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f'{"consumer":<8}{"conns":>8}{"connect/s":>12}{"delivered":>10}{"fan-out ms":>12}{"KiB/conn":>10}'
+        )
+        for connections in options['connections']:
+            for name, consumer in (('sync', SyncBenchConsumer), ('async', AsyncBenchConsumer)):
+                result = asyncio.run(self.bench(consumer, connections, options['timeout']))
+                self.stdout.write(
+                    f'{name:<8}{result["connected"]:>8}{result["connect_rate"]:>12.0f}{result["delivered"]:>10}'
+                    f'{result["fan_out_ms"]:>12.1f}{result["memory_per_connection"] / 1024:>10.1f}'
+                )
+
+    @staticmethod
+    async def bench(consumer, connections: int, timeout: float):
+        user = User(id=1, username='bench')  # Never saved, consumers only read scope user
+        application = consumer.as_asgi()
+        communicators = []
+        for _ in range(connections):
+            communicator = WebsocketCommunicator(application, '/bench/1/')
+            communicator.scope['user'] = user
+            communicators.append(communicator)
+
+        tracemalloc.start()
+        memory_before = tracemalloc.get_traced_memory()[0]
+        started = time.perf_counter()
+        results = await asyncio.gather(*[c.connect(timeout) for c in communicators], return_exceptions=True)
+        connect_time = time.perf_counter() - started
+        memory_per_connection = (tracemalloc.get_traced_memory()[0] - memory_before) / connections
+        tracemalloc.stop()
+        connected = sum(1 for r in results if not isinstance(r, Exception) and r[0])
+
+        started = time.perf_counter()
+        await get_channel_layer(consumer.channel_layer_alias).group_send('bench', {
+            'type': 'post.created.notification',
+            'params': {'title': 'Benchmark'},
+            'system': ActionSystem().to_data()
+        })
+
+        async def receive(communicator):
+            await communicator.receive_json_from(timeout)
+            return time.perf_counter()
+
+        # auth accepts before joining the group, so the latest connections may miss the event
+        received = [r for r in await asyncio.gather(*[receive(c) for c in communicators], return_exceptions=True)
+                    if not isinstance(r, Exception)]
+        fan_out_time = (max(received) if received else time.perf_counter()) - started
+
+        await asyncio.gather(*[c.disconnect() for c in communicators], return_exceptions=True)
+        return {
+            'connected': connected,
+            'connect_rate': connected / connect_time,
+            'delivered': len(received),
+            'fan_out_ms': fan_out_time * 1000,
+            'memory_per_connection': memory_per_connection,
+        }
@@ -0,0 +1,94 @@
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction, OperationalError
+
+from forum.models import User, Message
+from ._utils import test_database, percentile
+
+#: Environment of every database profile, applied to a fresh process because settings are read once
+PROFILES = {
+    'sqlite': {'DATABASE': 'sqlite', 'SQLITE_TUNED': '1'},
+    'sqlite-untuned': {'DATABASE': 'sqlite', 'SQLITE_TUNED': '0'},
+    'postgres': {'DATABASE': 'postgres'},
+}
+
+
+class Command(BaseCommand):
+    help = 'Concurrent message insert throughput of database profiles, every run on a throwaway test database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--profiles', nargs='+', choices=PROFILES, default=['sqlite-untuned', 'sqlite'])
+        parser.add_argument('--threads', type=int, nargs='+', default=[1, 4, 8])
+        parser.add_argument('--messages', type=int, default=200, help='Messages sent by every thread')
+        parser.add_argument('--worker', action='store_true', help='Bench current settings, print JSON lines')
+
+    def handle(self, *args, **options):
+        if options['worker']:
+            return self.worker(options['threads'], options['messages'])
+
+        self.stdout.write(f'{"profile":<16}{"threads":>8}{"msg/s":>10}{"p50 ms":>9}{"p95 ms":>9}{"p99 ms":>9}'
+                          f'{"errors":>8}')
+        for profile in options['profiles']:
+            worker = subprocess.run(
+                [sys.executable, sys.argv[0], 'bench_db_writes', '--worker', '--messages', str(options['messages']),
+                 '--threads', *map(str, options['threads'])],
+                env={**os.environ, **PROFILES[profile]}, capture_output=True, text=True
+            )
+            if worker.returncode:
+                self.stderr.write(f'{profile}: {worker.stderr.strip().splitlines()[-1]}')
+                continue
+            for line in worker.stdout.splitlines():
+                result = json.loads(line)
+                self.stdout.write(
+                    f'{profile:<16}{result["threads"]:>8}{result["rate"]:>10.0f}{result["p50"]:>9.2f}'
+                    f'{result["p95"]:>9.2f}{result["p99"]:>9.2f}{result["errors"]:>8}'
+                )
+
+    def worker(self, threads: list, messages: int):
+        with test_database():
+            for count in threads:
+                self.stdout.write(json.dumps(self.bench(count, messages)))
+
+    @staticmethod
+    def bench(threads: int, messages: int) -> dict:
+        users = [User.objects.create_user(f'bench-{threads}-{i}') for i in range(threads + 1)]
+        barrier = threading.Barrier(threads + 1)
+        latencies, errors = [], []
+
+        def send(author, recipient):
+            barrier.wait()
+            for i in range(messages):
+                started = time.perf_counter()
+                try:
+                    with transaction.atomic():  # Same as MessageCreateView
+                        Message.objects.create(author=author, recipient=recipient, content=f'bench {i}')
+                    latencies.append(time.perf_counter() - started)
+                except OperationalError:
+                    errors.append(i)
+            connection.close()
+
+        workers = [threading.Thread(target=send, args=(users[i], users[i + 1])) for i in range(threads)]
+        for worker in workers:
+            worker.start()
+        barrier.wait()
+        started = time.perf_counter()
+        for worker in workers:
+            worker.join()
+        seconds = time.perf_counter() - started
+        latencies.sort()
+        return {
+            'threads': threads,
+            'messages': len(latencies),
+            'errors': len(errors),
+            'seconds': seconds,
+            'rate': len(latencies) / seconds,
+            'p50': percentile(latencies, 0.50) * 1000,
+            'p95': percentile(latencies, 0.95) * 1000,
+            'p99': percentile(latencies, 0.99) * 1000,
+        }
@@ -0,0 +1,54 @@
+import asyncio
+import time
+
+from django.core.management.base import BaseCommand
+
+from forum.models import User
+from ws.base import encode_frames, Action, ActionSystem
+from ws.notifications import NotificationsConsumer
+
+
+class Command(BaseCommand):
+    help = 'Per-event consumer cost of post_created_notification fan-out, with and without frames encoded once'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--subscribers', type=int, nargs='+', default=[1000, 10000])
+        parser.add_argument('--events', type=int, default=5)
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'{"subscribers":>12}{"mode":>14}{"ms/event":>10}{"us/recipient":>14}{"frames/s":>12}')
+        for subscribers in options['subscribers']:
+            for mode in ('per-consumer', 'encode-once'):
+                seconds = asyncio.run(self.bench(subscribers, options['events'], mode == 'encode-once'))
+                per_event = seconds / options['events']
+                self.stdout.write(
+                    f'{subscribers:>12}{mode:>14}{per_event * 1000:>10.1f}'
+                    f'{per_event / subscribers * 1e6:>14.2f}{subscribers / per_event:>12.0f}'
+                )
+
+    @staticmethod
+    async def bench(subscribers: int, events: int, prepared: bool):
+        async def base_send(message):
+            ...
+
+        consumers = []
+        for user_id in range(1, subscribers + 1):
+            consumer = NotificationsConsumer()
+            consumer.scope = {'type': 'websocket', 'user': User(id=user_id, username=f'bench-{user_id}'),
+                              'subprotocols': ['msgpack'] if user_id % 2 else []}
+            consumer.channel_name = f'specific.bench!{user_id}'
+            consumer.base_send = base_send
+            consumer.coalesce_window = 0  # Every event is encoded and sent, as on the first event of a window
+            consumers.append(consumer)
+
+        started = time.perf_counter()
+        for _ in range(events):
+            params = {'title': 'Benchmark post title'}
+            system = ActionSystem(initiator_channel='specific.bench!0', initiator_user_id=0).to_data()
+            event = {'type': 'post.created.notification', 'params': params, 'system': system}
+            if prepared:
+                event['frames'] = encode_frames(Action(event='post_created_notification', system=system,
+                                                       params=params))
+            for consumer in consumers:
+                await consumer.post_created_notification(dict(event))
+        return time.perf_counter() - started
@@ -0,0 +1,92 @@
+import asyncio
+import json
+import time
+
+from channels.testing import WebsocketCommunicator
+from django.core.management.base import BaseCommand
+
+from forum.models import User
+from rush01.asgi import application
+from ws.users import user_cache
+from ._utils import test_database, percentile, session_cookie
+
+
+class Command(BaseCommand):
+    help = 'Reconnect storm against session cookie handshake auth: handshakes per second, latency and DB lookups'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=500)
+        parser.add_argument('--connections', type=int, default=5000, help='Concurrent handshakes of every round')
+        parser.add_argument('--invalid', type=float, default=0.1, help='Share of handshakes with unknown sessions')
+        parser.add_argument('--output', help='Write results to this JSON file')
+
+    def handle(self, *args, **options):
+        with test_database():
+            users = User.objects.bulk_create(User(username=f'bench-{i}') for i in range(options['users']))
+            if not users[0].id:  # Backends without RETURNING on bulk insert
+                users = list(User.objects.order_by('id'))
+            cookies = [(user.id, session_cookie(user)) for user in users]
+            results = asyncio.run(self.bench(cookies, options['connections'], options['invalid']))
+
+        self.stdout.write(f'{"round":<10}{"conns":>7}{"accepted":>9}{"rejected":>9}{"handshakes/s":>13}'
+                          f'{"p50 ms":>9}{"p95 ms":>9}{"p99 ms":>9}{"db lookups":>11}')
+        for result in results:
+            self.stdout.write(
+                f'{result["round"]:<10}{result["connections"]:>7}{result["accepted"]:>9}{result["rejected"]:>9}'
+                f'{result["rate"]:>13.0f}{result["p50_ms"]:>9.1f}{result["p95_ms"]:>9.1f}{result["p99_ms"]:>9.1f}'
+                f'{result["db_lookups"]:>11}'
+            )
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
+
+    async def bench(self, cookies: list, connections: int, invalid: float) -> list:
+        invalid_every = round(1 / invalid) if invalid else 0
+        handshakes = []
+        for i in range(connections):
+            user_id, cookie = cookies[i % len(cookies)]
+            if invalid_every and i % invalid_every == 0:
+                cookie = f'sessionid=unknown{i}'.encode()
+            handshakes.append((f'/notifications/{user_id}/', cookie))
+
+        ttl, results = user_cache.ttl, []
+        try:
+            # uncached keeps nothing between lookups, only concurrent handshakes of a session share one,
+            # warm reuses entries of the cold round
+            for name, round_ttl in (('uncached', 0), ('cold', ttl), ('warm', ttl)):
+                if name != 'warm':
+                    user_cache.clear()
+                user_cache.ttl = round_ttl
+                results.append({'round': name, **await self.storm(handshakes)})
+        finally:
+            user_cache.ttl = ttl
+        return results
+
+    @staticmethod
+    async def storm(handshakes: list) -> dict:
+        loads = user_cache.loads
+
+        async def handshake(path: str, cookie: bytes):
+            communicator = WebsocketCommunicator(application, path, headers=[(b'cookie', cookie)])
+            started = time.perf_counter()
+            connected, _ = await communicator.connect(timeout=30)
+            return communicator, connected, time.perf_counter() - started
+
+        started = time.perf_counter()
+        results = await asyncio.gather(*[handshake(path, cookie) for path, cookie in handshakes])
+        seconds = time.perf_counter() - started
+        await asyncio.gather(*[c.disconnect() for c, connected, _ in results if connected], return_exceptions=True)
+
+        latencies = sorted(latency for _, _, latency in results)
+        accepted = sum(1 for _, connected, _ in results if connected)
+        return {
+            'connections': len(results),
+            'accepted': accepted,
+            'rejected': len(results) - accepted,
+            'seconds': seconds,
+            'rate': len(results) / seconds,
+            'p50_ms': percentile(latencies, 0.50) * 1000,
+            'p95_ms': percentile(latencies, 0.95) * 1000,
+            'p99_ms': percentile(latencies, 0.99) * 1000,
+            'db_lookups': user_cache.loads - loads,
+        }
@@ -0,0 +1,89 @@
+import json
+import random
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+from forum.models import User, Post, Chat
+from ._utils import percentile
+
+
+class Command(BaseCommand):
+    help = 'Latency percentiles and query counts of forum views against the current database, see generate_dataset'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=50, help='Requests per view after one warm-up')
+        parser.add_argument('--username', help='Bench as this user, the most recently active chat member by default')
+        parser.add_argument('--output', help='Write results to this JSON file')
+
+    def handle(self, *args, **options):
+        chat = Chat.objects.first()
+        if options['username']:
+            user = User.objects.get(username=options['username'])
+            chat = Chat.inbox(user).first() or chat
+        elif chat:
+            user = chat.author
+        else:
+            raise CommandError('No chats, generate data with generate_dataset first')
+        posts = list(Post.objects.values_list('id', flat=True)[:1000])
+        if not posts:
+            raise CommandError('No posts, generate data with generate_dataset first')
+
+        recipient = chat.recipient_id if chat.author_id == user.id else chat.author_id
+
+        client = Client()
+        client.force_login(user)
+        views = [
+            ('IndexView', 'get', lambda: (reverse('home'), {})),
+            ('PostListView', 'get', lambda: (reverse('posts'), {})),
+            ('PostDetailView', 'get', lambda: (reverse('post_detail', args=[random.choice(posts)]), {})),
+            ('MessageListView', 'get', lambda: (reverse('messenger'), {})),
+            ('ChatDetailView', 'get', lambda: (reverse('chat', args=[chat.id]), {})),
+            ('ChatMessagesView', 'get', lambda: (reverse('chat_messages', args=[chat.id]), {'after': 0})),
+            ('PostUpView', 'post', lambda: (reverse('post_up'), {'post_id': random.choice(posts)})),
+            ('PostDownView', 'post', lambda: (reverse('post_down'), {'post_id': random.choice(posts)})),
+            ('MessageCreateView', 'post', lambda: (reverse('message_add'), {'chat_id': chat.id, 'content': 'Bench'})),
+            ('PostCreateView', 'post', lambda: (reverse('post_add'), {'title': 'Bench', 'content': 'Bench'})),
+            ('ChatCreateView', 'post', lambda: (reverse('chat_add'), {'recipient': recipient, 'content': 'Bench'})),
+        ]
+
+        self.stdout.write(f'{"view":<20}{"queries":>8}{"p50 ms":>9}{"p95 ms":>9}{"p99 ms":>9}{"max ms":>9}')
+        results = {}
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            for name, method, request in views:
+                results[name] = result = self.bench(client, method, request, options['requests'])
+                self.stdout.write(f'{name:<20}{result["queries"]:>8}{result["p50_ms"]:>9.1f}{result["p95_ms"]:>9.1f}'
+                                  f'{result["p99_ms"]:>9.1f}{result["max_ms"]:>9.1f}')
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump({'user': user.username, 'chat': chat.id, 'views': results}, f, indent=2)
+
+    @staticmethod
+    def bench(client: Client, method: str, request, count: int) -> dict:
+        latencies, queries = [], []
+        for i in range(count + 1):
+            url, data = request()
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                response = getattr(client, method)(url, data)
+                latency = time.perf_counter() - started
+            if response.status_code >= 400:
+                raise CommandError(f'{url} returned {response.status_code}')
+            if i:  # First request warms up caches
+                latencies.append(latency)
+                queries.append(len(captured))
+        latencies.sort()
+        return {
+            'requests': count,
+            'queries': max(queries),
+            'p50_ms': percentile(latencies, 0.50) * 1000,
+            'p95_ms': percentile(latencies, 0.95) * 1000,
+            'p99_ms': percentile(latencies, 0.99) * 1000,
+            'max_ms': latencies[-1] * 1000,
+        }
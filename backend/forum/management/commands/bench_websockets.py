@@ -0,0 +1,190 @@
+import asyncio
+import json
+import random
+import time
+import tracemalloc
+
+import msgpack
+from channels.layers import get_channel_layer
+from channels.testing import WebsocketCommunicator
+from django.core.management.base import BaseCommand
+
+from forum.models import User
+from rush01.asgi import application
+from ws.base import encode_frames, Action, ActionSystem
+from ._utils import test_database, percentile, session_cookie
+
+ACK_EVERY = 10  #: Frames between acks, same as the browser clients
+
+
+class Client:
+    """Authenticated websocket of one bench user, records delivery latency of every frame it receives"""
+
+    def __init__(self, path: str, user_id: int, cookie: bytes, subprotocol: str = None):
+        self.user_id = user_id
+        self.communicator = WebsocketCommunicator(application, path, headers=[(b'cookie', cookie)],
+                                                  subprotocols=[subprotocol] if subprotocol else None)
+        self.msgpack = subprotocol == 'msgpack'
+        self.reader = None
+        self.received = 0
+
+    async def connect(self, timeout: float) -> bool:
+        connected, _ = await self.communicator.connect(timeout)
+        if connected:
+            await self.ack()
+        return connected
+
+    async def ack(self):
+        """Acknowledge received frames like browser clients, see ws.outbound"""
+        await self.send({'event': 'ack', 'params': {'received': self.received}})
+
+    async def send(self, content: dict):
+        if self.msgpack:
+            await self.communicator.send_to(bytes_data=msgpack.packb(content))
+        else:
+            await self.communicator.send_json_to(content)
+
+    def start(self, sent: dict, latencies: list):
+        self.reader = asyncio.ensure_future(self.read(sent, latencies))
+
+    async def read(self, sent: dict, latencies: list):
+        while True:
+            output = await self.communicator.output_queue.get()
+            received = time.perf_counter()
+            if output['type'] != 'websocket.send':
+                return
+            frame = json.loads(output['text']) if output.get('text') else msgpack.unpackb(output['bytes'])
+            self.received += 1
+            if self.received % ACK_EVERY == 0:
+                await self.ack()
+            params = frame.get('params', {})
+            keys = [params.get('title') or params.get('content')]
+            if params.get('titles'):  # Coalesced posts, sent in order so the batch ends with the latest one
+                last = int(keys[0].rsplit('-', 1)[1])
+                keys = [f'post-{i}' for i in range(last - params['count'] + 1, last + 1)]
+            latencies.extend(received - sent[key] for key in keys if key in sent)
+
+    async def close(self):
+        if self.reader:
+            self.reader.cancel()
+        await self.communicator.disconnect()
+
+
+class Command(BaseCommand):
+    help = 'Load test ChatConsumer and NotificationsConsumer with authenticated connections, results as JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000,
+                            help='Every user opens a chat and a notifications socket')
+        parser.add_argument('--duration', type=float, default=10, help='Seconds of traffic')
+        parser.add_argument('--message-rate', type=float, default=100, help='message_send actions per second')
+        parser.add_argument('--notification-rate', type=float, default=2,
+                            help='post.created.notification events per second, each one fanned out to every user')
+        parser.add_argument('--subprotocol', choices=['json', 'msgpack'], default='json')
+        parser.add_argument('--timeout', type=float, default=30, help='Seconds to connect and to drain deliveries')
+        parser.add_argument('--output', help='Write results to this JSON file')
+
+    def handle(self, *args, **options):
+        with test_database():
+            users = User.objects.bulk_create(User(username=f'bench-{i}') for i in range(options['users']))
+            if not users[0].id:  # Backends without RETURNING on bulk insert
+                users = list(User.objects.order_by('id'))
+            result = asyncio.run(self.bench({user.id: session_cookie(user) for user in users}, options))
+
+        self.stdout.write(json.dumps(result, indent=2))
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(result, f, indent=2)
+
+    async def bench(self, cookies: dict, options: dict) -> dict:
+        subprotocol = 'msgpack' if options['subprotocol'] == 'msgpack' else None
+        chats = [Client(f'/chat/{user_id}/', user_id, cookie, subprotocol) for user_id, cookie in cookies.items()]
+        notifications = [Client(f'/notifications/{user_id}/', user_id, cookie, subprotocol)
+                         for user_id, cookie in cookies.items()]
+        clients = chats + notifications
+
+        tracemalloc.start()
+        memory_before = tracemalloc.get_traced_memory()[0]
+        started = time.perf_counter()
+        connected = await asyncio.gather(*[c.connect(options['timeout']) for c in clients], return_exceptions=True)
+        connect_time = time.perf_counter() - started
+        memory_per_connection = (tracemalloc.get_traced_memory()[0] - memory_before) / len(clients)
+        tracemalloc.stop()
+        connected = sum(1 for c in connected if c is True)
+        await asyncio.sleep(0.5)  # auth accepts before joining groups
+
+        sent, chat_latencies, notification_latencies = {}, [], []
+        for client in chats:
+            client.start(sent, chat_latencies)
+        for client in notifications:
+            client.start(sent, notification_latencies)
+
+        started = time.perf_counter()
+        messages, events = await asyncio.gather(
+            self.send_messages(chats, sent, options['message_rate'], options['duration']),
+            self.send_notifications(sent, options['notification_rate'], options['duration']),
+        )
+        expected = messages + events * len(notifications)
+        deadline = time.perf_counter() + options['timeout']
+        while len(chat_latencies) + len(notification_latencies) < expected and time.perf_counter() < deadline:
+            await asyncio.sleep(0.05)
+        elapsed = time.perf_counter() - started
+        await asyncio.gather(*[c.close() for c in clients], return_exceptions=True)
+
+        delivered = len(chat_latencies) + len(notification_latencies)
+        frames = sum(client.received for client in clients)
+        return {
+            'users': len(cookies),
+            'connections': len(clients),
+            'connected': connected,
+            'connect_per_second': connected / connect_time,
+            'memory_per_connection': memory_per_connection,
+            'subprotocol': options['subprotocol'],
+            'duration': elapsed,
+            'frames_expected': expected,
+            'frames_delivered': delivered,
+            'frames_received': frames,  # Fewer than delivered when notifications are coalesced
+            'frames_per_second': frames / elapsed,
+            'chat': self.summary(messages, chat_latencies),
+            'notifications': self.summary(events * len(notifications), notification_latencies),
+        }
+
+    @staticmethod
+    async def send_messages(chats: list, sent: dict, rate: float, duration: float) -> int:
+        count, started = 0, time.perf_counter()
+        while rate and time.perf_counter() - started < duration:
+            author, recipient = random.sample(chats, 2)
+            key = f'message-{count}'
+            sent[key] = time.perf_counter()
+            await author.send({'event': 'message_send', 'params': {'to_user_id': recipient.user_id, 'content': key}})
+            count += 1
+            await asyncio.sleep(max(0, started + count / rate - time.perf_counter()))
+        return count
+
+    @staticmethod
+    async def send_notifications(sent: dict, rate: float, duration: float) -> int:
+        """Same event as :func:`forum.models.post_notification`, sent straight to the channel layer"""
+        layer, system = get_channel_layer('notifications'), ActionSystem(initiator_user_id=0).to_data()
+        count, started = 0, time.perf_counter()
+        while rate and time.perf_counter() - started < duration:
+            params = {'title': f'post-{count}'}
+            sent[params['title']] = time.perf_counter()
+            await layer.group_send('notifications', {
+                'type': 'post.created.notification', 'params': params, 'system': system,
+                'frames': encode_frames(Action(event='post_created_notification', system=system, params=params))
+            })
+            count += 1
+            await asyncio.sleep(max(0, started + count / rate - time.perf_counter()))
+        return count
+
+    @staticmethod
+    def summary(expected: int, latencies: list) -> dict:
+        latencies.sort()
+        return {
+            'expected': expected,
+            'delivered': len(latencies),
+            'p50_ms': percentile(latencies, 0.50) * 1000,
+            'p95_ms': percentile(latencies, 0.95) * 1000,
+            'p99_ms': percentile(latencies, 0.99) * 1000,
+            'max_ms': latencies[-1] * 1000 if latencies else 0,
+        }
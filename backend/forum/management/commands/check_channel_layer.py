@@ -0,0 +1,57 @@
+import asyncio
+import subprocess
+import sys
+import time
+
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Check that a group message sent from this process reaches a consumer in another process'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--alias', default='notifications', choices=list(settings.CHANNEL_LAYERS))
+        parser.add_argument('--timeout', type=float, default=5)
+        parser.add_argument('--listen', help='Internal: wait for one message in the given group and print it')
+
+    def handle(self, *args, **options):
+        if options['listen']:
+            return asyncio.run(self.listen(options['alias'], options['listen'], options['timeout']))
+
+        group = f'check-{int(time.time() * 1000)}'
+        listener = subprocess.Popen(
+            [sys.executable, str(settings.BASE_DIR / 'manage.py'), 'check_channel_layer', '--alias', options['alias'],
+             '--timeout', str(options['timeout']), '--listen', group],
+            stdout=subprocess.PIPE, text=True
+        )
+        try:
+            if listener.stdout.readline().strip() != 'ready':
+                raise CommandError('Listener process failed to join the group')
+            started = time.perf_counter()
+            asyncio.run(get_channel_layer(options['alias']).group_send(group, {'type': 'check', 'sent': started}))
+            received = listener.stdout.readline().strip()
+            listener.wait(options['timeout'])
+        finally:
+            listener.kill()
+        if received != 'received':
+            raise CommandError(f'Message was not delivered across processes by {settings.CHANNEL_LAYER} layer')
+        self.stdout.write(self.style.SUCCESS(
+            f'Delivered across processes by {settings.CHANNEL_LAYER} layer '
+            f'in {(time.perf_counter() - started) * 1000:.1f} ms'
+        ))
+
+    @staticmethod
+    async def listen(alias: str, group: str, timeout: float):
+        layer = get_channel_layer(alias)
+        channel = await layer.new_channel()
+        await layer.group_add(group, channel)
+        print('ready', flush=True)
+        try:
+            await asyncio.wait_for(layer.receive(channel), timeout)
+            print('received', flush=True)
+        except asyncio.TimeoutError:
+            print('timeout', flush=True)
+        finally:
+            await layer.group_discard(group, channel)
@@ -0,0 +1,35 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from forum import plans
+from ._utils import test_database
+
+
+class Command(BaseCommand):
+    help = 'Fail when a query of any forum view reads a hot table without an index, same as forum.tests.QueryPlansTest'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verbose-plans', action='store_true', help='Print every checked query')
+
+    def handle(self, *args, **options):
+        failures = []
+        with test_database(), override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            plans.prefer_indexes()
+            for view, url, response, queries in plans.view_queries():
+                if response.status_code >= 400:
+                    raise CommandError(f'{view}: {url} returned {response.status_code}')
+                if view in plans.FORM_VIEWS and response.status_code != 302:
+                    raise CommandError(f'{view}: {url} did not accept the form')
+                for sql in queries:
+                    tables = plans.full_scans(sql)
+                    if tables:
+                        failures.append((view, tables, sql))
+                    if options['verbose_plans']:
+                        self.stdout.write(f'{view}: {"SCAN " + ", ".join(tables) if tables else "ok"}  {sql}')
+                self.stdout.write(f'{view:<24}{len(queries):>4} queries')
+        if failures:
+            raise CommandError(f'{len(failures)} queries scan hot tables:\n' + '\n'.join(
+                f'  {view}: {", ".join(tables)}\n    {sql}' for view, tables, sql in failures
+            ))
+        self.stdout.write(self.style.SUCCESS('No full scans of hot tables'))
@@ -0,0 +1,32 @@
+import asyncio
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from forum.outbox import OutboxDispatcher
+
+
+class Command(BaseCommand):
+    help = 'Send stored realtime events to the channel layer, for OUTBOX_DISPATCHER=command deployments'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.OUTBOX_BATCH_SIZE)
+        parser.add_argument('--poll-interval', type=float, default=0.2)
+        parser.add_argument('--max-attempts', type=int, default=settings.OUTBOX_MAX_ATTEMPTS)
+        parser.add_argument('--once', action='store_true', help='Send every available event and exit')
+
+    def handle(self, *args, **options):
+        dispatcher = OutboxDispatcher(batch_size=options['batch_size'], poll_interval=options['poll_interval'],
+                                      max_attempts=options['max_attempts'])
+        if options['once']:
+            asyncio.run(self.drain(dispatcher))
+            self.stdout.write(self.style.SUCCESS(f'{dispatcher.dispatched} events dispatched, '
+                                                 f'{dispatcher.retried} retried, {dispatcher.dropped} dropped'))
+            return
+        self.stdout.write(f'Dispatching outbox as {dispatcher.name}')
+        asyncio.run(dispatcher.run())
+
+    @staticmethod
+    async def drain(dispatcher: OutboxDispatcher):
+        while await dispatcher.dispatch_batch():
+            ...
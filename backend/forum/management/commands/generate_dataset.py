@@ -0,0 +1,92 @@
+import random
+import time
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from forum import search
+from forum.models import User, Post, Comment, Notification, Chat, Message
+
+
+def batches(items, size: int):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class Command(BaseCommand):
+    help = 'Bulk generate users, posts, comments, votes, chats and messages at production scale'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10000)
+        parser.add_argument('--posts', type=int, default=50000)
+        parser.add_argument('--comments', type=int, default=200000)
+        parser.add_argument('--votes', type=int, default=500000)
+        parser.add_argument('--chats', type=int, default=50000)
+        parser.add_argument('--messages', type=int, default=1000000)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--prefix', default='load', help='Usernames are <prefix>-<n>, password is the prefix')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        random.seed(options['seed'])
+        self.batch_size = options['batch_size']
+        prefix = options['prefix']
+
+        password = make_password(prefix)
+        self.insert(User, (User(username=f'{prefix}-{i}', password=password) for i in range(options['users'])))
+        users = list(User.objects.filter(username__startswith=f'{prefix}-').values_list('id', flat=True))
+
+        first_post = Post.objects.order_by('-id').values_list('id', flat=True).first() or 0
+        self.insert(Post, (Post(title=f'Post {i}', content=f'Generated post {i} ' * 20, author_id=random.choice(users))
+                           for i in range(options['posts'])))
+        posts = list(Post.objects.filter(id__gt=first_post).values_list('id', flat=True))
+        self.insert(Notification, (Notification(content=f'Post {i}', type='forum') for i in range(len(posts))))
+
+        self.insert(Comment, (Comment(post_id=random.choice(posts), author_id=random.choice(users),
+                                      content=f'Generated comment {i}') for i in range(options['comments'])))
+        votes = [(random.choice(posts), random.choice(users)) for _ in range(options['votes'])]
+        for through, down in ((Post.vote_up.through, False), (Post.vote_down.through, True)):
+            # Direction depends on the pair only, so nobody votes both ways on a post
+            self.insert(through, (through(post_id=post_id, user_id=user_id) for post_id, user_id in votes
+                                  if ((post_id + user_id) % 5 == 0) == down), ignore_conflicts=True)
+
+        pairs = {tuple(sorted(random.sample(users, 2))) for _ in range(options['chats'])}
+        self.insert(Chat, (Chat(author_id=a, recipient_id=b, participants=Chat.participants_key(a, b))
+                           for a, b in pairs), ignore_conflicts=True)
+        chats = list(Chat.objects.filter(author__username__startswith=f'{prefix}-')
+                     .values_list('id', 'author_id', 'recipient_id'))
+
+        def messages():
+            for i in range(options['messages']):
+                chat_id, author_id, recipient_id = random.choice(chats)
+                if i % 2:
+                    author_id, recipient_id = recipient_id, author_id
+                yield Message(chat_id=chat_id, author_id=author_id, recipient_id=recipient_id,
+                              content=f'Generated message {i}')
+
+        self.insert(Message, messages())
+        self.insert(Notification, (Notification(user_id=random.choice(users), content='Generated message',
+                                                type='message') for _ in range(options['messages'] // 100)))
+
+        call_command('rebuild_reputation', stdout=self.stdout)
+        call_command('rebuild_chats', stdout=self.stdout)
+        if search.available():  # bulk_create skips the indexing signals
+            call_command('rebuild_search_index', stdout=self.stdout)
+
+    def insert(self, model, objects, ignore_conflicts: bool = False):
+        started, count = time.perf_counter(), 0
+        for batch in batches(objects, self.batch_size):
+            with transaction.atomic():
+                model.objects.bulk_create(batch, ignore_conflicts=ignore_conflicts)
+            count += len(batch)
+        seconds = time.perf_counter() - started
+        self.stdout.write(f'{model._meta.db_table:<24}{count:>10} rows{seconds:>8.1f}s'
+                          f'{count / max(seconds, 1e-9):>10.0f}/s')
@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
+
+from forum.models import Chat, Message
+
+
+class Command(BaseCommand):
+    help = 'Merge duplicate chats of the same participants, then recalculate last message of every chat'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--if-needed', action='store_true',
+                            help='Only when chats or messages of older releases lack participants or chat, for run.sh')
+
+    def handle(self, *args, **options):
+        if options['if_needed'] and not (Chat.objects.filter(participants__isnull=True).exists()
+                                         or Message.objects.filter(chat__isnull=True).exists()):
+            self.stdout.write('Chats are up to date')
+            return
+        with transaction.atomic():
+            merged = self.merge_duplicates()
+            for message in Message.objects.filter(chat__isnull=True):
+                message.chat = Chat.for_pair(message.author_id, message.recipient_id)
+                message.save(update_fields=['chat'])
+
+            last = Message.objects.filter(chat_id=OuterRef('pk')).order_by('-date', '-id')
+            updated = Chat.objects.update(last_message=Subquery(last.values('id')[:1]),
+                                          last_activity=Subquery(last.values('date')[:1]))
+        self.stdout.write(self.style.SUCCESS(f'Merged {merged} duplicate chats, last activity rebuilt for {updated}'))
+
+    @staticmethod
+    def merge_duplicates():
+        """Keep the oldest chat of every participant pair, move messages of the others into it"""
+        keepers, duplicates = {}, {}
+        for chat in Chat.objects.order_by('id').only('id', 'author_id', 'recipient_id', 'participants'):
+            key = Chat.participants_key(chat.author_id, chat.recipient_id)
+            if key in keepers:
+                duplicates[chat.id] = keepers[key].id
+                continue
+            keepers[key] = chat
+
+        for duplicate_id, keeper_id in duplicates.items():
+            Message.objects.filter(chat_id=duplicate_id).update(chat_id=keeper_id)
+        Chat.objects.filter(id__in=duplicates).delete()
+
+        missing = [chat for key, chat in keepers.items() if chat.participants != key]
+        for chat in missing:
+            chat.participants = Chat.participants_key(chat.author_id, chat.recipient_id)
+        Chat.objects.bulk_update(missing, ['participants'], batch_size=1000)
+        return len(duplicates)
@@ -0,0 +1,54 @@
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from forum.models import User, Post, REPUTATION_VOTE_UP, REPUTATION_VOTE_DOWN
+
+
+def count_votes(through):
+    return Coalesce(Subquery(
+        through.objects.filter(post_id=OuterRef('pk')).values('post_id').annotate(votes=Count('id')).values('votes')
+    ), Value(0))
+
+
+class Command(BaseCommand):
+    help = 'Recalculate post vote tallies and stored reputation of all users from post votes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--if-needed', action='store_true',
+                            help='Only when vote tallies or reputation disagree with post votes, for run.sh')
+
+    @staticmethod
+    def stale_tallies() -> bool:
+        return Post.objects.annotate(
+            up=count_votes(Post.vote_up.through), down=count_votes(Post.vote_down.through)
+        ).exclude(votes_up=F('up'), votes_down=F('down')).exists()
+
+    @staticmethod
+    def stale_reputation(reputation: Counter) -> bool:
+        expected = {user_id: rep for user_id, rep in reputation.items() if rep}
+        stored = User.objects.filter(Q(id__in=list(reputation)) | ~Q(reputation=0)).values_list('id', 'reputation')
+        return {user_id: rep for user_id, rep in stored if rep} != expected
+
+    def handle(self, *args, **options):
+        reputation = Counter()
+        for through, weight in ((Post.vote_up.through, REPUTATION_VOTE_UP),
+                                (Post.vote_down.through, REPUTATION_VOTE_DOWN)):
+            for row in through.objects.values('post__author').annotate(votes=Count('id')):
+                reputation[row['post__author']] += row['votes'] * weight
+
+        if options['if_needed'] and not (self.stale_tallies() or self.stale_reputation(reputation)):
+            self.stdout.write('Vote tallies and reputation are up to date')
+            return
+
+        users = [User(id=user_id, reputation=rep) for user_id, rep in reputation.items()]
+        with transaction.atomic():
+            Post.objects.update(votes_up=count_votes(Post.vote_up.through),
+                                votes_down=count_votes(Post.vote_down.through))
+            User.objects.update(reputation=0)
+            User.objects.bulk_update(users, ['reputation'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Vote tallies and reputation rebuilt for {len(users)} users'))
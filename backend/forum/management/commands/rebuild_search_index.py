@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from forum import search
+
+
+class Command(BaseCommand):
+    help = 'Recreate the full-text search index of posts and comments in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        if not search.available():
+            raise CommandError('Full-text index needs SQLite FTS5 or PostgreSQL')
+
+        search.create_index(drop=True)
+        posts, comments = search.fill(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Indexed {posts} posts and {comments} comments'))
@@ -1,36 +1,85 @@
-from asgiref.sync import async_to_sync
-from channels.layers import get_channel_layer
 from django.contrib.auth.models import AbstractUser
-from django.db import models
-from django.db.models.signals import post_save
+from django.db import models, transaction
+from django.db.models import F, Q, Subquery, Value, Exists, OuterRef
+from django.db.models.functions import Coalesce
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
 from django.dispatch import receiver
+from django.template.defaultfilters import time as time_format
+from django.utils import timezone
+from django.utils.timezone import localtime
+
+from . import counters, navbar, outbox, search
+
+
+REPUTATION_VOTE_UP = 5
+REPUTATION_VOTE_DOWN = -2
 
 
 class User(AbstractUser):
     description = models.CharField(max_length=300, blank=True, null=True)
     profile_picture = models.ImageField(upload_to='profile_pictures', null=True, blank=True)
+    reputation = models.IntegerField(default=0, editable=False)
+    forum_read_watermark = models.BigIntegerField(default=0, editable=False)  #: Last read broadcast notification id
 
     # notifications: Notification
     # messages: Message
     # posts: Post
 
-    @property
-    def reputation(self):
-        rep = 0
-        posts = self.posts.all()
-        for post in posts:
-            rep += post.vote_up.count() * 5
-            rep -= post.vote_down.count() * 2
-        return rep
+    @staticmethod
+    def change_reputation(user_id, delta: int):
+        if delta:
+            User.objects.filter(id=user_id).update(reputation=F('reputation') + delta)
+            navbar.invalidate(user_id)
 
     @property
     def forum_notification(self):
-        return Notification.objects.filter(type='forum', is_read=False, user=self).all()
+        return Notification.objects.filter(
+            Q(user__isnull=True) | Q(user=self, is_read=False),
+            type='forum', id__gt=self.forum_read_watermark
+        ).all()
+
+    def read_forum_notification(self):
+        User.objects.filter(id=self.id).update(forum_read_watermark=Coalesce(Subquery(
+            Notification.objects.filter(type='forum').order_by('-id').values('id')[:1]
+        ), Value(0)))
+        self.refresh_from_db(fields=['forum_read_watermark'])
 
     @property
     def message_notification(self):
         return Notification.objects.filter(type='message', is_read=False, user=self).all()
 
+    @property
+    def forum_unread(self) -> int:
+        return counters.forum_unread(self)
+
+    @property
+    def message_unread(self) -> int:
+        return counters.message_unread(self)
+
+
+@receiver(pre_save, sender=User)
+def user_forum_watermark(instance, **kwargs):
+    if instance._state.adding:
+        instance.forum_read_watermark = Notification.last_id(type='forum')
+
+
+@receiver(post_save, sender=User)
+def user_navbar(instance, created, **kwargs):
+    if not created:
+        navbar.invalidate(instance.id)
+
+
+class PostQuerySet(models.QuerySet):
+    def with_user_vote(self, user):
+        """Annotate ``user_vote_up`` and ``user_vote_down`` of user inside the same query"""
+        if not user.is_authenticated:
+            return self.annotate(user_vote_up=Value(False, models.BooleanField()),
+                                 user_vote_down=Value(False, models.BooleanField()))
+        return self.annotate(
+            user_vote_up=Exists(Post.vote_up.through.objects.filter(post_id=OuterRef('pk'), user_id=user.id)),
+            user_vote_down=Exists(Post.vote_down.through.objects.filter(post_id=OuterRef('pk'), user_id=user.id)),
+        )
+
 
 class Post(models.Model):
     title = models.CharField(max_length=100)
@@ -38,12 +87,53 @@ class Post(models.Model):
     date = models.DateTimeField(auto_now_add=True)
     vote_up = models.ManyToManyField(User, related_name='vote_up')
     vote_down = models.ManyToManyField(User, related_name='vote_down')
+    votes_up = models.IntegerField(default=0, editable=False)  #: Denormalized ``vote_up`` count
+    votes_down = models.IntegerField(default=0, editable=False)  #: Denormalized ``vote_down`` count
     author = models.ForeignKey(User, models.CASCADE, related_name='posts')
 
+    objects = PostQuerySet.as_manager()
+
     # comments: Comment
 
     class Meta:
-        ordering = ['-date']
+        ordering = ['-date', '-id']
+        indexes = [models.Index(fields=['-date', '-id'], name='post_feed_idx')]
+
+    def toggle_vote(self, user: User, up: bool) -> dict:
+        """Add or remove user's vote and drop the opposite one, returns fresh tallies"""
+        votes, opposite = (Post.vote_up.through, Post.vote_down.through) if up \
+            else (Post.vote_down.through, Post.vote_up.through)
+        field, opposite_field = ('votes_up', 'votes_down') if up else ('votes_down', 'votes_up')
+        weight, opposite_weight = (REPUTATION_VOTE_UP, REPUTATION_VOTE_DOWN) if up \
+            else (REPUTATION_VOTE_DOWN, REPUTATION_VOTE_UP)
+        with transaction.atomic():
+            # Concurrent votes on the post wait here, so a double click never inserts the same vote twice
+            Post.objects.select_for_update().filter(id=self.id).values_list('id', flat=True).first()
+            removed, _ = votes.objects.filter(post_id=self.id, user_id=user.id).delete()
+            if removed:
+                tallies, delta = {field: F(field) - 1}, -weight
+            else:
+                votes.objects.create(post_id=self.id, user_id=user.id)
+                tallies, delta = {field: F(field) + 1}, weight
+                if opposite.objects.filter(post_id=self.id, user_id=user.id).delete()[0]:
+                    tallies[opposite_field] = F(opposite_field) - 1
+                    delta -= opposite_weight
+            Post.objects.filter(id=self.id).update(**tallies)
+            User.change_reputation(self.author_id, delta)
+            self.refresh_from_db(fields=['votes_up', 'votes_down'])
+        return {
+            'up': self.votes_up,
+            'down': self.votes_down,
+            'vote': None if removed else 'up' if up else 'down',
+        }
+
+
+@receiver(pre_delete, sender=Post)
+def post_reputation_drop(instance, **kwargs):
+    User.change_reputation(
+        instance.author_id,
+        -(instance.votes_up * REPUTATION_VOTE_UP + instance.votes_down * REPUTATION_VOTE_DOWN)
+    )
 
 
 @receiver(post_save, sender=Post)
@@ -51,19 +141,31 @@ def post_notification(instance, created, **kwargs):
     if not created:
         return
 
-    from ws.base import get_system_cache, ActionSystem
-    for user in User.objects.all():
-        Notification.objects.create(user=user, content=instance.title, type='forum')
+    from ws.base import get_system_cache, encode_frames, Action, ActionSystem
+    Notification.objects.create(content=instance.title, type='forum')
+    counters.bump_forum()
 
-    layer = get_channel_layer()
-    async_to_sync(layer.group_send)(
-        'notifications',
+    params = {'title': instance.title[:30]}
+    system = ActionSystem(**get_system_cache(instance.author)).to_data()
+    outbox.publish(
+        'notifications', 'notifications',
         {'type': 'post.created.notification',
-         'params': {'title': instance.title[:30]},
-         'system': ActionSystem(**get_system_cache(instance.author)).to_data()}
+         'params': params,
+         'system': system,
+         'frames': encode_frames(Action(event='post_created_notification', system=system, params=params))}
     )
 
 
+@receiver(post_save, sender=Post)
+def post_search_index(instance, **kwargs):
+    search.index([search.post_row(instance.id, instance.title, instance.content)])
+
+
+@receiver(post_delete, sender=Post)
+def post_search_unindex(instance, **kwargs):
+    search.unindex([search.post_rowid(instance.id)])
+
+
 class Comment(models.Model):
     content = models.TextField()
     date = models.DateTimeField(auto_now_add=True)
@@ -71,18 +173,80 @@ class Comment(models.Model):
     author = models.ForeignKey(User, models.CASCADE)
 
 
+@receiver(post_save, sender=Comment)
+def comment_search_index(instance, **kwargs):
+    search.index([search.comment_row(instance.id, instance.post_id, instance.content)])
+
+
+@receiver(post_delete, sender=Comment)
+def comment_search_unindex(instance, **kwargs):
+    search.unindex([search.comment_rowid(instance.id)])
+
+
 class Notification(models.Model):
     content = models.TextField()
     is_read = models.BooleanField(default=False)
     type = models.CharField(max_length=50)
-    user = models.ForeignKey(User, models.CASCADE, related_name='notifications')
+    user = models.ForeignKey(User, models.CASCADE, related_name='notifications', null=True,
+                             blank=True)  #: Empty for broadcast notifications, read state lives on the user
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'type', 'is_read'], name='notification_user_unread_idx'),
+            models.Index(fields=['type', 'id'], name='notification_type_idx'),
+        ]
+
+    @staticmethod
+    def last_id(**filters) -> int:
+        return Notification.objects.filter(**filters).order_by('-id').values_list('id', flat=True).first() or 0
 
 
 class Chat(models.Model):
     author = models.ForeignKey(User, models.CASCADE, related_name='chat_message_author')
     recipient = models.ForeignKey(User, models.CASCADE, related_name='chat_message_recipient')
+    participants = models.CharField(max_length=41, unique=True, null=True, blank=True,
+                                    editable=False)  #: Ordered participant pair, see :func:`Chat.participants_key`
+    last_message = models.ForeignKey('Message', models.SET_NULL, null=True, blank=True, related_name='+')
+    last_activity = models.DateTimeField(null=True, blank=True)  #: Date of :attr:`last_message`
     # chat_messages: Message
 
+    class Meta:
+        ordering = ['-last_activity', '-id']
+        indexes = [
+            models.Index(fields=['author', '-last_activity'], name='chat_author_activity_idx'),
+            models.Index(fields=['recipient', '-last_activity'], name='chat_recipient_activity_idx'),
+        ]
+
+    @staticmethod
+    def participants_key(user_id: int, other_user_id: int):
+        return ':'.join(str(i) for i in sorted((int(user_id), int(other_user_id))))
+
+    @staticmethod
+    def for_pair(author_id: int, recipient_id: int) -> 'Chat':
+        """Single chat of two users in any direction, created atomically when missing"""
+        return Chat.objects.get_or_create(
+            participants=Chat.participants_key(author_id, recipient_id),
+            defaults={'author_id': author_id, 'recipient_id': recipient_id}
+        )[0]
+
+    @staticmethod
+    def inbox(user: User):
+        return Chat.objects.filter(Q(author=user) | Q(recipient=user)).select_related('last_message__author')
+
+    def history(self, before: int = None, after: int = None, limit: int = 50):
+        """Up to ``limit`` messages in ascending order: newest ones, older than ``before`` or newer than ``after``"""
+        messages = self.chat_messages.order_by('id')
+        if after is not None:
+            return list(messages.filter(id__gt=after)[:limit])
+        if before is not None:
+            messages = messages.filter(id__lt=before)
+        return list(messages.order_by('-id')[:limit])[::-1]
+
+
+@receiver(pre_save, sender=Chat)
+def chat_participants(instance, **kwargs):
+    instance.participants = Chat.participants_key(instance.author_id, instance.recipient_id)
+
 
 class Message(models.Model):
     content = models.TextField()
@@ -91,40 +255,64 @@ class Message(models.Model):
     recipient = models.ForeignKey(User, models.CASCADE, related_name='recipient')
     chat = models.ForeignKey(Chat, models.CASCADE, null=True, blank=True, related_name='chat_messages')
 
+    class Meta:
+        indexes = [models.Index(fields=['chat', 'id'], name='message_chat_history_idx')]
+
+    def to_data(self):
+        return {
+            'id': self.id,
+            'chat_id': self.chat_id,
+            'author_id': self.author_id,
+            'content': self.content,
+            'time': time_format(localtime(self.date)),
+        }
+
+
+@receiver(pre_save, sender=Message)
+def message_chat(instance, **kwargs):
+    if not instance.chat_id:
+        instance.chat = Chat.for_pair(instance.author_id, instance.recipient_id)
+
 
 @receiver(post_save, sender=Message)
 def message_notification(instance, created, **kwargs):
     if not created:
         return
-    from ws.base import get_system_cache, ActionSystem
+    from ws.base import get_system_cache, user_group_name, ActionSystem
+    from ws.presence import presence
 
     Notification.objects.create(user=instance.recipient, content=instance.content, type='message')
-    layer = get_channel_layer()
-    async_to_sync(layer.group_send)(
-        'notifications',
-        {'type': 'new.message.notification',
-         'params': {'content': instance.content[:30], 'author': instance.author.username,
-                    'to_user_id': instance.recipient.id},
-         'system': ActionSystem(**get_system_cache(instance.author)).to_data()}
-    )
-    async_to_sync(layer.group_send)(
-        'chat',
-        {'type': 'message.send',
-         'params': {'content': instance.content,
-                    'to_user_id': instance.recipient.id,
-                    'time': instance.date.strftime("%I:%M %p").replace('AM', 'a.m.').replace('PM', 'p.m.')
-                    },
-         'system': ActionSystem(**get_system_cache(instance.author)).to_data()}
-    )
-    if not instance.chat:
-        if not Chat.objects.filter(author=instance.author, recipient=instance.recipient):
-            instance.chat = Chat.objects.create(author=instance.author, recipient=instance.recipient)
-        elif not Chat.objects.filter(recipient=instance.author, author=instance.recipient):
-            instance.chat = Chat.objects.create(author=instance.author, recipient=instance.recipient)
-        else:
-            chat = Chat.objects.filter(author=instance.author, recipient=instance.recipient).first()
-            chat_reverse = Chat.objects.filter(author=instance.recipient, recipient=instance.author).first()
-            if chat:
-                instance.chat = chat
-            else:
-                instance.chat = chat_reverse
+    counters.bump_message(instance.recipient_id)
+    # Offline recipients get messages and counters from the database on their next page load
+    if presence.should_send('notifications', instance.recipient_id):
+        outbox.publish(
+            'notifications', user_group_name('notifications', instance.recipient_id),
+            {'type': 'new.message.notification',
+             'params': {'content': instance.content[:30], 'author': instance.author.username,
+                        'to_user_id': instance.recipient.id},
+             'system': ActionSystem(**get_system_cache(instance.author)).to_data()}
+        )
+    if presence.should_send('chat', instance.recipient_id):
+        outbox.publish(
+            'chat', user_group_name('chat', instance.recipient_id),
+            {'type': 'message.send',
+             'params': {**instance.to_data(), 'to_user_id': instance.recipient_id},
+             'system': ActionSystem(**get_system_cache(instance.author, 'chat')).to_data()}
+        )
+    Chat.objects.filter(id=instance.chat.id).update(last_message=instance, last_activity=instance.date)
+
+
+class OutboxEvent(models.Model):
+    """Channel layer event stored in the transaction that caused it, sent by :class:`forum.outbox.OutboxDispatcher`"""
+    layer = models.CharField(max_length=50)  #: Channel layer alias
+    group = models.CharField(max_length=100)  #: Channel layer group
+    event = models.BinaryField()  #: Msgpack encoded event
+    created = models.DateTimeField(auto_now_add=True)
+    attempts = models.PositiveIntegerField(default=0)
+    available_at = models.DateTimeField(default=timezone.now)  #: Not sent before, moved forward on retry
+    claimed_by = models.CharField(max_length=64, null=True, blank=True)  #: Dispatcher sending the event
+    claimed_until = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [models.Index(fields=['available_at', 'id'], name='outbox_available_idx')]
@@ -0,0 +1,39 @@
+"""
+Navbar summary of the logged in user kept in the cache.
+
+Every page renders reputation, avatar and unread counters of the user. The summary is cached under a key made of
+a per-user version, bumped by :func:`invalidate` when any of them changes, and the total of broadcast forum
+notifications, so a new post needs no per-user invalidation.
+"""
+from django.core.cache import cache
+from django.templatetags.static import static
+
+from . import counters
+
+NAVBAR_TIMEOUT = 10 * 60
+
+
+def version_key(user_id: int):
+    return f'navbar-version-{user_id}'
+
+
+def summary(user) -> dict:
+    key = f'navbar-{user.id}-{cache.get(version_key(user.id), 0)}-{counters.forum_total()}'
+    data = cache.get(key)
+    if data is None:
+        data = {
+            'username': user.username,
+            'reputation': user.reputation,
+            'avatar': user.profile_picture.url if user.profile_picture else static('anon-cat.jpg'),
+            'forum_unread': counters.forum_unread(user),
+            'message_unread': counters.message_unread(user),
+        }
+        cache.set(key, data, NAVBAR_TIMEOUT)
+    return data
+
+
+def invalidate(user_id: int):
+    try:
+        cache.incr(version_key(user_id))
+    except ValueError:
+        cache.set(version_key(user_id), 1, None)
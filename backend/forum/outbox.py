@@ -0,0 +1,137 @@
+"""
+Transactional outbox for realtime side effects.
+
+Signal handlers store channel layer events with :func:`publish` in the transaction of the rows that caused them.
+:class:`OutboxDispatcher` sends committed events in batches and retries them on channel layer errors,
+so HTTP requests never wait for websocket fan-out and rolled back changes never reach clients.
+"""
+import asyncio
+import logging
+import uuid
+from datetime import timedelta
+
+import msgpack
+from channels.db import database_sync_to_async
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Min, Q
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+def publish(layer: str, group: str, event: dict):
+    """Store ``group_send`` of event to group on layer alias, sent after the current transaction commits"""
+    from .models import OutboxEvent
+    OutboxEvent.objects.create(layer=layer, group=group, event=msgpack.packb(event))
+    transaction.on_commit(dispatcher.wake)
+
+
+class OutboxDispatcher:
+    def __init__(self, batch_size: int = 100, poll_interval: float = 1, max_attempts: int = 10,
+                 claim_timeout: float = 30):
+        self.batch_size = batch_size  #: Events claimed at once
+        self.poll_interval = poll_interval  #: Seconds between polls when nobody wakes the dispatcher
+        self.max_attempts = max_attempts  #: Event is dropped after that many failed sends
+        self.claim_timeout = claim_timeout  #: Seconds before events claimed by a dead dispatcher are claimed again
+        self.name = uuid.uuid4().hex[:16]
+        self.dispatched = 0
+        self.retried = 0
+        self.dropped = 0
+        self.last_delivery_lag = None  #: Seconds between commit and send of the latest event
+        self._claims = 0
+        self._loop = None
+        self._wakeup = None
+        self._task = None
+
+    def start(self):
+        """Run dispatcher in the current event loop, does nothing when already running"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_event_loop().create_task(self.run())
+
+    def wake(self):
+        """Dispatch without waiting for the next poll, safe to call from any thread"""
+        if self._loop and self._wakeup:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def run(self):
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        while True:
+            try:
+                claimed = await self.dispatch_batch()
+            except Exception:
+                logger.exception('Outbox dispatch failed')
+                claimed = 0
+            if claimed < self.batch_size:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    ...
+                self._wakeup.clear()
+
+    async def dispatch_batch(self) -> int:
+        events = await database_sync_to_async(self.claim)()
+        sent, failed = [], []
+        for event in events:
+            try:
+                await get_channel_layer(event.layer).group_send(event.group, msgpack.unpackb(event.event))
+                sent.append(event)
+            except Exception as e:
+                logger.warning(f'Outbox event {event.id} to {event.group} failed: {e.__class__.__name__}: {e}')
+                failed.append(event)
+        if events:
+            await database_sync_to_async(self.complete)(sent, failed)
+        return len(events)
+
+    def claim(self):
+        from .models import OutboxEvent
+        now = timezone.now()
+        self._claims += 1
+        token = f'{self.name}-{self._claims}'
+        available = Q(claimed_until__isnull=True) | Q(claimed_until__lt=now), Q(available_at__lte=now)
+        batch = OutboxEvent.objects.filter(*available).order_by('id').values('id')[:self.batch_size]
+        OutboxEvent.objects.filter(*available, id__in=batch).update(
+            claimed_by=token, claimed_until=now + timedelta(seconds=self.claim_timeout)
+        )
+        return list(OutboxEvent.objects.filter(claimed_by=token).order_by('id'))
+
+    def complete(self, sent: list, failed: list):
+        from .models import OutboxEvent
+        now = timezone.now()
+        if sent:
+            OutboxEvent.objects.filter(id__in=[event.id for event in sent]).delete()
+            self.dispatched += len(sent)
+            self.last_delivery_lag = (now - sent[-1].created).total_seconds()
+        for event in failed:
+            if event.attempts + 1 >= self.max_attempts:
+                event.delete()
+                self.dropped += 1
+                logger.error(f'Outbox event {event.id} to {event.group} dropped after {self.max_attempts} attempts')
+                continue
+            OutboxEvent.objects.filter(id=event.id).update(
+                attempts=event.attempts + 1, claimed_by=None, claimed_until=None,
+                available_at=now + timedelta(seconds=min(2 ** event.attempts, 60))
+            )
+            self.retried += 1
+
+    def stats(self) -> dict:
+        from .models import OutboxEvent
+        pending = OutboxEvent.objects.aggregate(oldest=Min('created'))
+        return {
+            'pending': OutboxEvent.objects.count(),
+            'lag': (timezone.now() - pending['oldest']).total_seconds() if pending['oldest'] else 0,
+            'last_delivery_lag': self.last_delivery_lag,
+            'dispatched': self.dispatched,
+            'retried': self.retried,
+            'dropped': self.dropped,
+            'running': self._task is not None and not self._task.done(),
+        }
+
+
+dispatcher = OutboxDispatcher(
+    batch_size=getattr(settings, 'OUTBOX_BATCH_SIZE', 100),
+    poll_interval=getattr(settings, 'OUTBOX_POLL_INTERVAL', 1),
+    max_attempts=getattr(settings, 'OUTBOX_MAX_ATTEMPTS', 10),
+)
@@ -0,0 +1,94 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as DecodeError
+
+from django.db.models import Q, QuerySet
+from django.http import Http404
+from django.utils.dateparse import parse_datetime
+
+
+class CursorPage:
+    def __init__(self, object_list, has_next: bool, has_previous: bool, paginator: 'CursorPaginator'):
+        self.object_list = object_list
+        self.paginator = paginator
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    @property
+    def next_cursor(self):
+        if self._has_next:
+            return self.paginator.encode_cursor(self.object_list[-1], forward=True)
+
+    @property
+    def previous_cursor(self):
+        if self._has_previous:
+            return self.paginator.encode_cursor(self.object_list[0], forward=False)
+
+
+class CursorPaginator:
+    """
+    Keyset pagination over ``(date, id)`` in descending order
+
+    Every page is one indexed range query of ``per_page + 1`` rows, no COUNT and no OFFSET
+    """
+
+    def __init__(self, queryset: QuerySet, per_page: int, field: str = 'date'):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.field = field
+
+    def encode_cursor(self, obj, forward: bool):
+        value = f'{"n" if forward else "p"}|{getattr(obj, self.field).isoformat()}|{obj.pk}'
+        return urlsafe_b64encode(value.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor: str):
+        try:
+            direction, value, pk = urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode().split('|')
+            value = parse_datetime(value)
+            if direction not in ('n', 'p') or value is None:
+                raise ValueError
+            return direction == 'n', value, int(pk)
+        except (DecodeError, UnicodeDecodeError, ValueError):
+            raise Http404('Invalid cursor')
+
+    def page(self, cursor: str = None) -> CursorPage:
+        queryset = self.queryset.order_by(f'-{self.field}', '-pk')
+        if not cursor:
+            rows = list(queryset[:self.per_page + 1])
+            return CursorPage(rows[:self.per_page], len(rows) > self.per_page, False, self)
+
+        forward, value, pk = self.decode_cursor(cursor)
+        if forward:
+            rows = list(queryset.filter(
+                Q(**{f'{self.field}__lt': value}) | Q(**{self.field: value, 'pk__lt': pk})
+            )[:self.per_page + 1])
+            return CursorPage(rows[:self.per_page], len(rows) > self.per_page, True, self)
+
+        rows = list(queryset.filter(
+            Q(**{f'{self.field}__gt': value}) | Q(**{self.field: value, 'pk__gt': pk})
+        ).order_by(self.field, 'pk')[:self.per_page + 1])
+        return CursorPage(rows[:self.per_page][::-1], True, len(rows) > self.per_page, self)
+
+
+class CursorPaginationMixin:
+    """Replace offset pagination of ``ListView`` with :class:`CursorPaginator`, cursor comes from ``?cursor=``"""
+    cursor_field = 'date'
+
+    def paginate_queryset(self, queryset, page_size):
+        paginator = CursorPaginator(queryset, page_size, self.cursor_field)
+        page = paginator.page(self.request.GET.get('cursor'))
+        return paginator, page, page.object_list, page.has_other_pages()
@@ -0,0 +1,87 @@
+"""
+Query plans of forum views.
+
+:func:`view_queries` fills a small forum and requests every view, :func:`full_scans` explains each query
+and names the :data:`HOT_TABLES` it reads without an index. ``forum.tests.QueryPlansTest`` fails on any of them,
+``manage.py check_query_plans`` prints them for a throwaway database of the configured backend.
+"""
+import re
+
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .models import User, Post, Comment, Message, Chat
+from .pagination import CursorPaginator
+
+#: Tables that grow with usage, a full scan of any of them is a regression
+HOT_TABLES = {
+    'forum_post', 'forum_post_vote_up', 'forum_post_vote_down', 'forum_comment', 'forum_notification',
+    'forum_chat', 'forum_message', 'forum_outboxevent',
+}
+
+SQLITE_SCAN = re.compile(r'^SCAN (?:TABLE )?(\w+)\b(?! USING (?:COVERING )?INDEX| USING INTEGER PRIMARY KEY)')
+POSTGRES_SCAN = re.compile(r'Seq Scan on (\w+)')
+TABLE_ALIAS = re.compile(r'(?:FROM|JOIN) "(\w+)" (?:AS )?"?(\w+)"?')
+
+FORM_VIEWS = ('post_add', 'chat_add')  #: Views redirecting on success, re-rendered invalid forms are 200 too
+
+
+def prefer_indexes():
+    """PostgreSQL scans tables of a few rows whatever their indexes, unless told otherwise"""
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SET enable_seqscan = off')
+
+
+def full_scans(sql: str) -> list:
+    """Hot tables read without an index by the query"""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            aliases = dict((alias, table) for table, alias in TABLE_ALIAS.findall(sql))
+            tables = [aliases.get(m.group(1), m.group(1))
+                      for row in cursor.fetchall() for m in [SQLITE_SCAN.match(row[-1])] if m]
+        else:
+            cursor.execute(f'EXPLAIN {sql}')
+            tables = [m.group(1) for row in cursor.fetchall() for m in [POSTGRES_SCAN.search(row[0])] if m]
+    return [table for table in tables if table in HOT_TABLES]
+
+
+def view_queries():
+    """Request every forum view of a fresh forum, yields ``(view, url, response, sql)`` with queries worth a plan"""
+    user, other = User.objects.create_user('plan', password='plan'), User.objects.create_user('plan-other')
+    posts = [Post.objects.create(title=f'Post {i}', content='Content', author=other) for i in range(25)]
+    Comment.objects.create(post=posts[0], author=user, content='Comment')
+    for i in range(5):
+        Message.objects.create(author=other, recipient=user, content=f'Message {i}')
+    chat = Chat.for_pair(user.id, other.id)
+    cursor = CursorPaginator(Post.objects.all(), 10).page().next_cursor
+
+    client = Client()
+    client.force_login(user)
+    requests = [
+        ('home', 'get', reverse('home'), {}),
+        ('home next', 'get', reverse('home'), {'cursor': cursor}),
+        ('posts', 'get', reverse('posts'), {}),
+        ('post_detail', 'get', reverse('post_detail', args=[posts[0].id]), {}),
+        ('post_up', 'post', reverse('post_up'), {'post_id': posts[0].id}),
+        ('post_down', 'post', reverse('post_down'), {'post_id': posts[0].id}),
+        ('comment_add', 'post', reverse('comment_add'), {'post_id': posts[0].id, 'content': 'Comment'}),
+        ('messenger', 'get', reverse('messenger'), {}),
+        ('chat', 'get', reverse('chat', args=[chat.id]), {}),
+        ('chat_simple', 'get', reverse('chat_simple', args=[chat.id]), {}),
+        ('chat_messages after', 'get', reverse('chat_messages', args=[chat.id]), {'after': 1}),
+        ('chat_messages before', 'get', reverse('chat_messages', args=[chat.id]), {'before': 5}),
+        ('message_add', 'post', reverse('message_add'), {'chat_id': chat.id, 'content': 'Reply'}),
+        ('post_add', 'post', reverse('post_add'), {'title': 'Plan', 'content': 'Content'}),
+        ('chat_add', 'post', reverse('chat_add'), {'recipient': other.id, 'content': 'Hello'}),
+        ('profile', 'get', reverse('profile'), {}),
+        ('profile_detail', 'get', reverse('profile_detail', args=[other.id]), {}),
+    ]
+    for view, method, url, data in requests:
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(client, method)(url, data)
+        yield view, url, response, [q['sql'] for q in queries
+                                    if q['sql'].lstrip().split()[0] in ('SELECT', 'UPDATE', 'DELETE')]
@@ -0,0 +1,188 @@
+"""
+Full-text search over posts and comments.
+
+The index is the table :data:`SEARCH_TABLE`, kept in sync from ``Post`` and ``Comment`` signals
+and rebuilt after ``migrate`` when rows are missing.
+With SQLite it is an FTS5 table ranked by bm25, with PostgreSQL a table with a weighted ``tsvector`` column
+behind a GIN index ranked by ``ts_rank``, titles weighted over content on both.
+Posts are stored at rowid ``2 * id`` and comments at ``2 * id + 1``. Results are ordered by rank, lower is better,
+then rowid, and paginated by an opaque ``(rank, rowid)`` cursor.
+Other databases have no search.
+"""
+import re
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as DecodeError
+
+from django.db import connection, transaction, NotSupportedError
+from django.http import Http404
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+SEARCH_TABLE = 'forum_search'
+TITLE_WEIGHT = 10.0
+SNIPPET_WORDS = 16
+MARK_START, MARK_END = '\x02', '\x03'  #: Placeholders of highlighted terms, replaced after escaping the snippet
+
+
+def available() -> bool:
+    return connection.vendor in ('sqlite', 'postgresql')
+
+
+def create_index(drop: bool = False):
+    with connection.cursor() as cursor:
+        if drop:
+            cursor.execute(f'DROP TABLE IF EXISTS {SEARCH_TABLE}')
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                f"CREATE TABLE IF NOT EXISTS {SEARCH_TABLE} ("
+                f"rowid bigint PRIMARY KEY, title text NOT NULL, content text NOT NULL, "
+                f"kind varchar(10) NOT NULL, post_id bigint NOT NULL, "
+                f"document tsvector GENERATED ALWAYS AS (setweight(to_tsvector('simple'::regconfig, title), 'A') "
+                f"|| setweight(to_tsvector('simple'::regconfig, content), 'B')) STORED)"
+            )
+            cursor.execute(f'CREATE INDEX IF NOT EXISTS {SEARCH_TABLE}_document ON {SEARCH_TABLE} USING GIN (document)')
+            return
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5("
+            f"title, content, kind UNINDEXED, post_id UNINDEXED, tokenize = 'unicode61 remove_diacritics 2')"
+        )
+        cursor.execute(f"INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}, rank) VALUES ('rank', %s)",
+                       [f'bm25({TITLE_WEIGHT}, 1.0)'])
+
+
+def incomplete() -> bool:
+    """Whether some posts or comments are missing from the index, like rows of ``bulk_create`` or older releases"""
+    from .models import Post, Comment
+
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT count(*) FROM {SEARCH_TABLE}')
+        return cursor.fetchone()[0] < Post.objects.count() + Comment.objects.count()
+
+
+def fill(batch_size: int = 2000) -> tuple:
+    """Index every post and comment, walking tables by primary key so every batch is one indexed range query"""
+    from .models import Post, Comment
+
+    counts = []
+    for queryset, row in ((Post.objects.values_list('id', 'title', 'content'), post_row),
+                          (Comment.objects.values_list('id', 'post_id', 'content'), comment_row)):
+        last_id, count = 0, 0
+        while True:
+            batch = list(queryset.filter(id__gt=last_id).order_by('id')[:batch_size])
+            if not batch:
+                break
+            with transaction.atomic():
+                index([row(*values) for values in batch])
+            last_id, count = batch[-1][0], count + len(batch)
+        counts.append(count)
+    return tuple(counts)
+
+
+def post_rowid(post_id: int) -> int:
+    return post_id * 2
+
+
+def comment_rowid(comment_id: int) -> int:
+    return comment_id * 2 + 1
+
+
+def post_row(post_id: int, title: str, content: str):
+    return post_rowid(post_id), title, content, 'post', post_id
+
+
+def comment_row(comment_id: int, post_id: int, content: str):
+    return comment_rowid(comment_id), '', content, 'comment', post_id
+
+
+def index(rows: list):
+    if not available() or not rows:
+        return
+    insert = f'INSERT INTO {SEARCH_TABLE} (rowid, title, content, kind, post_id) VALUES (%s, %s, %s, %s, %s)'
+    if connection.vendor == 'postgresql':
+        insert += (' ON CONFLICT (rowid) DO UPDATE SET title = EXCLUDED.title, content = EXCLUDED.content, '
+                   'kind = EXCLUDED.kind, post_id = EXCLUDED.post_id')
+    else:
+        insert = insert.replace('INSERT', 'INSERT OR REPLACE', 1)
+    with connection.cursor() as cursor:
+        cursor.executemany(insert, rows)
+
+
+def unindex(rowids: list):
+    if not available() or not rowids:
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(f'DELETE FROM {SEARCH_TABLE} WHERE rowid = %s', [(rowid,) for rowid in rowids])
+
+
+def match_expression(query: str) -> str:
+    """Every word of the query as a quoted FTS5 term, the last one as a prefix, so user input is never syntax"""
+    words = re.findall(r'\w+', query)
+    return ' '.join(f'"{word}"' for word in words[:-1]) + (f' "{words[-1]}"*' if words else '')
+
+
+def tsquery_expression(query: str) -> str:
+    """Same terms as :func:`match_expression` for ``to_tsquery``, words never contain its operators"""
+    words = re.findall(r'\w+', query)
+    return ' & '.join(words[:-1] + [f'{words[-1]}:*']) if words else ''
+
+
+def encode_cursor(rank: float, rowid: int) -> str:
+    return urlsafe_b64encode(f'{rank!r}|{rowid}'.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str):
+    try:
+        rank, rowid = urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode().split('|')
+        return float(rank), int(rowid)
+    except (DecodeError, UnicodeDecodeError, ValueError):
+        raise Http404('Invalid cursor')
+
+
+def highlight(snippet: str):
+    return mark_safe(escape(snippet).replace(MARK_START, '<mark>').replace(MARK_END, '</mark>'))
+
+
+def search(query: str, cursor: str = None, limit: int = 20):
+    """Up to ``limit`` results best first and the cursor of the next page, ``None`` on the last one"""
+    from .models import Post
+
+    if not available():
+        raise NotSupportedError(f'Full-text search needs SQLite or PostgreSQL, not {connection.vendor}')
+    expression = match_expression(query)
+    if not expression:
+        return [], None
+
+    after, position = 'TRUE', []
+    if cursor:
+        rank, rowid = decode_cursor(cursor)
+        after, position = '(rank > %s OR (rank = %s AND rowid > %s))', [rank, rank, rowid]
+    with connection.cursor() as db:
+        if connection.vendor == 'postgresql':
+            # Headlines are the slow part, so only rows of the page get one
+            db.execute(
+                f"SELECT rowid, kind, post_id, ts_headline('simple'::regconfig, content, query, %s), rank FROM ("
+                f"SELECT * FROM (SELECT rowid, kind, post_id, content, query, "
+                f"(-ts_rank(%s::float4[], document, query))::float8 AS rank "
+                f"FROM {SEARCH_TABLE}, to_tsquery('simple'::regconfig, %s) AS query WHERE document @@ query) hits "
+                f"WHERE {after} ORDER BY rank, rowid LIMIT %s) page ORDER BY rank, rowid",
+                [f'StartSel={MARK_START}, StopSel={MARK_END}, MaxWords={SNIPPET_WORDS}, MinWords=1, ShortWord=0',
+                 [0.0, 0.0, 1 / TITLE_WEIGHT, 1.0], tsquery_expression(query)] + position + [limit + 1]
+            )
+        else:
+            db.execute(
+                f"SELECT rowid, kind, post_id, snippet({SEARCH_TABLE}, -1, %s, %s, '…', {SNIPPET_WORDS}), rank "
+                f"FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s AND {after} ORDER BY rank, rowid LIMIT %s",
+                [MARK_START, MARK_END, expression] + position + [limit + 1]
+            )
+        rows = db.fetchall()
+
+    titles = dict(Post.objects.filter(id__in={row[2] for row in rows[:limit]}).values_list('id', 'title'))
+    results = [{
+        'kind': kind,
+        'id': rowid // 2,
+        'post_id': post_id,
+        'title': titles.get(post_id, ''),
+        'snippet': highlight(snippet),
+    } for rowid, kind, post_id, snippet, rank in rows[:limit]]
+    next_cursor = encode_cursor(rows[limit - 1][4], rows[limit - 1][0]) if len(rows) > limit else None
+    return results, next_cursor
@@ -0,0 +1,268 @@
+from base64 import urlsafe_b64encode
+from datetime import timedelta
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.http import Http404
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from . import counters, outbox, plans
+from .models import User, Post, Message, Chat, Notification, OutboxEvent, REPUTATION_VOTE_UP, REPUTATION_VOTE_DOWN
+from .pagination import CursorPaginator
+from .views import ChatMessagesView
+
+
+class QueryPlansTest(TestCase):
+    """Every query of forum views reads hot tables by index, see :mod:`forum.plans`"""
+
+    def setUp(self):
+        cache.clear()
+        plans.prefer_indexes()
+
+    def test_views_use_indexes(self):
+        for view, url, response, queries in plans.view_queries():
+            with self.subTest(view=view):
+                self.assertLess(response.status_code, 400, url)
+                if view in plans.FORM_VIEWS:
+                    self.assertEqual(response.status_code, 302, f'{url} did not accept the form')
+                scans = [(sql, tables) for sql in queries for tables in [plans.full_scans(sql)] if tables]
+                self.assertEqual(scans, [])
+
+
+class OutboxDispatcherTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.dispatcher = outbox.OutboxDispatcher(batch_size=2, max_attempts=3)
+        for i in range(3):
+            outbox.publish('notifications', 'notifications', {'type': 'post.created.notification', 'params': {'i': i}})
+
+    def dispatch(self, group_send: mock.AsyncMock) -> int:
+        with mock.patch.object(outbox, 'get_channel_layer', return_value=mock.Mock(group_send=group_send)):
+            return async_to_sync(self.dispatcher.dispatch_batch)()
+
+    def dispatch_failing(self) -> list:
+        with self.assertLogs(outbox.logger, 'WARNING') as logs:
+            self.dispatch(mock.AsyncMock(side_effect=OSError('layer is down')))
+        return logs.output
+
+    def test_claim_and_complete(self):
+        claimed = self.dispatcher.claim()
+        self.assertEqual([event.id for event in claimed], list(OutboxEvent.objects.values_list('id', flat=True)[:2]))
+        other = outbox.OutboxDispatcher(batch_size=2)
+        self.assertEqual([event.id for event in other.claim()], [OutboxEvent.objects.last().id])
+
+        self.dispatcher.complete(claimed, [])
+        self.assertEqual(OutboxEvent.objects.count(), 1)
+        self.assertEqual(self.dispatcher.dispatched, 2)
+
+    def test_dispatch_sends_events(self):
+        group_send = mock.AsyncMock()
+        self.assertEqual(self.dispatch(group_send), 2)
+        group_send.assert_has_awaits([
+            mock.call('notifications', {'type': 'post.created.notification', 'params': {'i': i}}) for i in range(2)
+        ])
+        self.assertEqual(OutboxEvent.objects.count(), 1)
+
+    def test_failed_events_retry_with_backoff(self):
+        self.dispatch_failing()
+        retried = OutboxEvent.objects.filter(attempts=1)
+        self.assertEqual(retried.count(), 2)
+        self.assertFalse(retried.filter(claimed_by__isnull=False).exists())
+        self.assertEqual(self.dispatcher.retried, 2)
+        self.assertEqual([event.attempts for event in self.dispatcher.claim()], [0])  # Failed ones wait for backoff
+
+        OutboxEvent.objects.update(available_at=timezone.now(), claimed_by=None, claimed_until=None)
+        before = timezone.now()
+        self.dispatch_failing()
+        for event in OutboxEvent.objects.filter(attempts=2):
+            self.assertGreaterEqual(event.available_at, before + timedelta(seconds=2))
+
+    def test_events_dropped_after_max_attempts(self):
+        OutboxEvent.objects.update(attempts=self.dispatcher.max_attempts - 1)
+        logs = self.dispatch_failing()
+        self.assertEqual(OutboxEvent.objects.count(), 1)
+        self.assertEqual(sum('dropped after 3 attempts' in line for line in logs), 2)
+        self.assertEqual(self.dispatcher.dropped, 2)
+        self.assertEqual(self.dispatcher.retried, 0)
+
+
+class ChatTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author, self.recipient = User.objects.create_user('author'), User.objects.create_user('recipient')
+        self.chat = Chat.for_pair(self.author.id, self.recipient.id)
+        self.client.force_login(self.author)
+
+    def test_one_chat_per_pair(self):
+        self.assertEqual(Chat.for_pair(self.recipient.id, self.author.id), self.chat)
+        reply = Message.objects.create(author=self.recipient, recipient=self.author, content='Reply')
+        self.assertEqual(reply.chat, self.chat)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Chat.objects.create(author=self.recipient, recipient=self.author)
+        self.assertEqual(Chat.objects.count(), 1)
+
+    def test_chat_of_others_not_found(self):
+        self.client.force_login(User.objects.create_user('stranger'))
+        for name in ('chat', 'chat_simple', 'chat_messages'):
+            with self.subTest(view=name):
+                self.assertEqual(self.client.get(reverse(name, args=[self.chat.id])).status_code, 404)
+
+    def messages(self, **params) -> tuple:
+        data = self.client.get(reverse('chat_messages', args=[self.chat.id]), params).json()
+        return [message['id'] for message in data['messages']], data['has_more']
+
+    def test_history_windows(self):
+        window = ChatMessagesView.history_window
+        Message.objects.bulk_create([
+            Message(author=self.author, recipient=self.recipient, chat=self.chat, content=f'Message {i}')
+            for i in range(window + 10)
+        ])
+        ids = list(self.chat.chat_messages.order_by('id').values_list('id', flat=True))
+
+        self.assertEqual(self.messages(), (ids[-window:], True))
+        self.assertEqual(self.messages(before=ids[window]), (ids[:window], False))
+        self.assertEqual(self.messages(before=ids[window + 1]), (ids[1:window + 1], True))
+        self.assertEqual(self.messages(after=ids[-window - 1]), (ids[-window:], False))
+        self.assertEqual(self.messages(after=ids[-window - 2]), (ids[-window - 1:-1], True))
+        self.assertEqual(self.messages(after=ids[-1]), ([], False))
+        response = self.client.get(reverse('chat_messages', args=[self.chat.id]), {'before': 'last'})
+        self.assertEqual(response.status_code, 400)
+
+
+class VoteTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author, self.voter = User.objects.create_user('author'), User.objects.create_user('voter')
+        self.post = Post.objects.create(title='Post', content='Content', author=self.author)
+
+    def reputation(self) -> int:
+        return User.objects.get(id=self.author.id).reputation
+
+    def test_toggle_on_and_off(self):
+        self.assertEqual(self.post.toggle_vote(self.voter, up=True), {'up': 1, 'down': 0, 'vote': 'up'})
+        self.assertTrue(self.post.vote_up.filter(id=self.voter.id).exists())
+        self.assertEqual(self.reputation(), REPUTATION_VOTE_UP)
+
+        self.assertEqual(self.post.toggle_vote(self.voter, up=True), {'up': 0, 'down': 0, 'vote': None})
+        self.assertFalse(self.post.vote_up.exists())
+        self.assertEqual(self.reputation(), 0)
+
+    def test_switch_direction(self):
+        self.post.toggle_vote(self.voter, up=True)
+        self.assertEqual(self.post.toggle_vote(self.voter, up=False), {'up': 0, 'down': 1, 'vote': 'down'})
+        self.assertFalse(self.post.vote_up.exists())
+        self.assertTrue(self.post.vote_down.filter(id=self.voter.id).exists())
+        self.assertEqual(self.reputation(), REPUTATION_VOTE_DOWN)
+
+        self.assertEqual(self.post.toggle_vote(self.voter, up=True), {'up': 1, 'down': 0, 'vote': 'up'})
+        self.assertEqual(self.reputation(), REPUTATION_VOTE_UP)
+
+    def test_post_delete_drops_reputation(self):
+        other = Post.objects.create(title='Other', content='Content', author=self.author)
+        self.post.toggle_vote(self.voter, up=True)
+        self.post.toggle_vote(User.objects.create_user('critic'), up=False)
+        other.toggle_vote(self.voter, up=True)
+        self.assertEqual(self.reputation(), 2 * REPUTATION_VOTE_UP + REPUTATION_VOTE_DOWN)
+
+        Post.objects.get(id=self.post.id).delete()
+        self.assertEqual(self.reputation(), REPUTATION_VOTE_UP)
+
+
+class UnreadCountersTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author, self.reader = User.objects.create_user('author'), User.objects.create_user('reader')
+        self.client.force_login(self.reader)
+
+    def post(self, title: str = 'Post') -> Post:
+        with self.captureOnCommitCallbacks(execute=True):
+            return Post.objects.create(title=title, content='Content', author=self.author)
+
+    def message(self) -> Message:
+        with self.captureOnCommitCallbacks(execute=True):
+            return Message.objects.create(author=self.author, recipient=self.reader, content='Message')
+
+    def test_new_user_starts_at_latest_forum_notification(self):
+        self.post()
+        user = User.objects.create_user('newcomer')
+        self.assertEqual(user.forum_read_watermark, Notification.last_id(type='forum'))
+        self.assertEqual(counters.forum_unread(user), 0)
+
+    def test_forum_unread_until_posts_are_read(self):
+        self.assertEqual(counters.forum_unread(self.reader), 0)
+        self.post()
+        self.post()
+        self.assertEqual(counters.forum_unread(self.reader), 2)
+        cache.clear()
+        self.assertEqual(counters.forum_unread(self.reader), 2)  # Recounted from the watermark
+
+        self.client.get(reverse('posts'))
+        self.reader.refresh_from_db()
+        self.assertEqual(self.reader.forum_read_watermark, Notification.last_id(type='forum'))
+        self.assertEqual(counters.forum_unread(self.reader), 0)
+        cache.clear()
+        self.assertEqual(counters.forum_unread(self.reader), 0)
+
+    def test_message_unread_until_messenger_is_opened(self):
+        self.assertEqual(counters.message_unread(self.reader), 0)
+        self.message()
+        self.message()
+        self.assertEqual(counters.message_unread(self.reader), 2)
+        self.assertEqual(counters.message_unread(self.author), 0)
+
+        self.client.get(reverse('messenger'))
+        self.assertEqual(counters.message_unread(self.reader), 0)
+        cache.clear()
+        self.assertEqual(counters.message_unread(self.reader), 0)
+
+    def test_rolled_back_post_is_not_counted(self):
+        self.assertEqual(counters.forum_unread(self.reader), 0)
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with transaction.atomic():
+                Post.objects.create(title='Draft', content='Content', author=self.author)
+                transaction.set_rollback(True)
+        self.assertEqual(callbacks, [])
+        self.assertEqual(counters.forum_unread(self.reader), 0)
+
+
+class CursorPaginatorTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        author = User.objects.create_user('author')
+        posts = [Post.objects.create(title=f'Post {i}', content='Content', author=author) for i in range(25)]
+        Post.objects.filter(id__in=[post.id for post in posts[5:15]]).update(date=posts[5].date)  # Ties by pk
+        self.ids = list(Post.objects.order_by('-date', '-id').values_list('id', flat=True))
+        self.paginator = CursorPaginator(Post.objects.all(), 10)
+
+    def ids_of(self, page) -> list:
+        return [post.id for post in page]
+
+    def test_next_and_previous_pages(self):
+        first = self.paginator.page()
+        self.assertEqual(self.ids_of(first), self.ids[:10])
+        self.assertEqual((first.has_previous(), first.has_next()), (False, True))
+
+        second = self.paginator.page(first.next_cursor)
+        self.assertEqual(self.ids_of(second), self.ids[10:20])
+        self.assertEqual((second.has_previous(), second.has_next()), (True, True))
+
+        last = self.paginator.page(second.next_cursor)
+        self.assertEqual(self.ids_of(last), self.ids[20:])
+        self.assertEqual((last.has_previous(), last.has_next()), (True, False))
+        self.assertIsNone(last.next_cursor)
+
+        back = self.paginator.page(last.previous_cursor)
+        self.assertEqual(self.ids_of(back), self.ids[10:20])
+        self.assertEqual(self.ids_of(self.paginator.page(back.previous_cursor)), self.ids[:10])
+        self.assertFalse(self.paginator.page(back.previous_cursor).has_previous())
+
+    def test_invalid_cursor_not_found(self):
+        encoded = [urlsafe_b64encode(value.encode()).decode() for value in ('cursor', 'x|2020-01-01|1', 'n|date|1')]
+        for cursor in ('zz', *encoded):
+            with self.subTest(cursor=cursor), self.assertRaises(Http404):
+                self.paginator.page(cursor)
+        self.assertEqual(self.client.get(reverse('home'), {'cursor': 'zz'}).status_code, 404)
@@ -2,7 +2,8 @@ from django.urls import path
 
 from .views import IndexView, SignInView, SignUpView, Logout, ProfileUpdateView, ProfileDetailView, \
     ProfileSelfDetailView, PostDetailView, PostListView, CommentCreateView, MessageListView, ChatDetailView, \
-    MessageCreateView, ChatDetailSimple, PostUpView, PostDownView, PostCreateView, ChatCreateView
+    MessageCreateView, ChatDetailSimple, PostUpView, PostDownView, PostCreateView, ChatCreateView, ChatMessagesView, \
+    SearchView, SearchResultsView
 
 urlpatterns = [
     path('', IndexView.as_view(), name='home'),
@@ -20,7 +21,10 @@ urlpatterns = [
     path('chat/<int:pk>/', ChatDetailView.as_view(), name='chat'),
     path('chat/add/', ChatCreateView.as_view(), name='chat_add'),
     path('chat/simple/<int:pk>/', ChatDetailSimple.as_view(), name='chat_simple'),
+    path('chat/<int:pk>/messages/', ChatMessagesView.as_view(), name='chat_messages'),
     path('message/add/', MessageCreateView.as_view(), name='message_add'),
     path('post/up/', PostUpView.as_view(), name='post_up'),
     path('post/down/', PostDownView.as_view(), name='post_down'),
+    path('search/', SearchView.as_view(), name='search'),
+    path('search/results/', SearchResultsView.as_view(), name='search_results'),
 ]
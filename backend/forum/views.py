@@ -2,18 +2,20 @@ from typing import Callable
 
 from django.contrib.auth import login, logout
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.db.models import Q
-from django.http import HttpRequest, HttpResponse
+from django.db import transaction
+from django.http import HttpRequest, HttpResponse, JsonResponse
 from django.shortcuts import render, redirect
 from django.urls import reverse_lazy
 from django.utils.decorators import method_decorator
 from django.views.decorators.csrf import csrf_exempt
 from django.views.generic import TemplateView, View, UpdateView, ListView, DetailView, CreateView
 
+from . import counters, search
 from .forms import SignInForm, SignUpForm, ProfileForm, ProfileDetailForm, PostForm
 from django.contrib.auth import get_user_model
 
 from .models import Post, Comment, Notification, Message, Chat
+from .pagination import CursorPaginationMixin
 
 User = get_user_model()
 
@@ -40,11 +42,13 @@ def only_for_authed(f: Callable):
     return wrapper
 
 
-class IndexView(ListView):
+class IndexView(CursorPaginationMixin, ListView):
     template_name = 'index.html'
     model = Post
     paginate_by = 10
-    queryset = Post.objects.all()
+
+    def get_queryset(self):
+        return Post.objects.with_user_vote(self.request.user)
 
 
 class ProfileUpdateView(UpdateView):
@@ -126,15 +130,22 @@ class PostDetailView(DetailView):
     model = Post
     template_name = 'post_detail.html'
 
+    def get_queryset(self):
+        return Post.objects.with_user_vote(self.request.user)
+
 
-class PostListView(ListView):
+class PostListView(CursorPaginationMixin, ListView):
     model = Post
     template_name = 'posts.html'
+    paginate_by = 10
+
+    def get_queryset(self):
+        return Post.objects.with_user_vote(self.request.user)
 
     def get(self, request, *args, **kwargs):
-        for notification in Notification.objects.filter(type='forum', user=request.user):
-            notification.is_read = True
-            notification.save()
+        if request.user.is_authenticated:
+            request.user.read_forum_notification()
+            counters.reset_forum(request.user)
         return super(PostListView, self).get(request, *args, **kwargs)
 
 
@@ -146,35 +157,89 @@ class CommentCreateView(View):
         return HttpResponse('OK')
 
 
+class SearchView(TemplateView):
+    """Posts and comments matching ``?q=``, next pages by ``?cursor=``"""
+    template_name = 'search.html'
+    paginate_by = 20
+
+    def get_context_data(self, **kwargs):
+        query = self.request.GET.get('q', '')
+        results, next_cursor = search.search(query, self.request.GET.get('cursor'), self.paginate_by)
+        return {**super(SearchView, self).get_context_data(**kwargs),
+                'query': query, 'results': results, 'next_cursor': next_cursor}
+
+
+class SearchResultsView(SearchView):
+    """Same results as :class:`SearchView` as JSON"""
+
+    def get(self, request, *args, **kwargs):
+        context = self.get_context_data(**kwargs)
+        return JsonResponse({'results': context['results'], 'next_cursor': context['next_cursor']})
+
+
 class MessageListView(LoginRequired, ListView):
     model = Chat
     template_name = 'messenger.html'
     paginate_by = 10
 
     def get_queryset(self):
-        return Chat.objects.filter(Q(author=self.request.user) | Q(recipient=self.request.user))
+        return Chat.inbox(self.request.user)
 
     def get(self, request, *args, **kwargs):
-        for notification in Notification.objects.filter(type='message', user=request.user):
-            notification.is_read = True
-            notification.save()
+        Notification.objects.filter(type='message', user=request.user, is_read=False).update(is_read=True)
+        counters.reset_message(request.user)
         return super(MessageListView, self).get(request, *args, **kwargs)
 
 
-class ChatDetailView(LoginRequired, DetailView):
+class ChatHistoryMixin:
+    history_window = 50
+
+    def get_queryset(self):
+        return Chat.inbox(self.request.user)
+
+    def get_context_data(self, **kwargs):
+        messages = self.object.history(limit=self.history_window + 1)
+        kwargs.update({'messages': messages[-self.history_window:], 'has_older': len(messages) > self.history_window})
+        return super(ChatHistoryMixin, self).get_context_data(**kwargs)
+
+
+class ChatDetailView(LoginRequired, ChatHistoryMixin, DetailView):
     model = Chat
     template_name = 'chat_detail.html'
     context_object_name = 'chat'
 
 
-class ChatDetailSimple(LoginRequired, DetailView):
+class ChatDetailSimple(LoginRequired, ChatHistoryMixin, DetailView):
     model = Chat
     template_name = 'chat_detail_simple.html'
     context_object_name = 'chat'
 
 
+class ChatMessagesView(LoginRequired, ChatHistoryMixin, DetailView):
+    """Messages newer than ``?after=<id>`` or a window older than ``?before=<id>`` as JSON"""
+    model = Chat
+
+    def get(self, request, *args, **kwargs):
+        chat = self.get_object()
+        try:
+            after = int(request.GET['after']) if 'after' in request.GET else None
+            before = int(request.GET['before']) if 'before' in request.GET else None
+        except ValueError:
+            return JsonResponse({'error': 'Cursor must be a message id'}, status=400)
+        messages = chat.history(before=before, after=after, limit=self.history_window + 1)
+        if after is not None:
+            has_more, messages = len(messages) > self.history_window, messages[:self.history_window]
+        else:
+            has_more, messages = len(messages) > self.history_window, messages[-self.history_window:]
+        return JsonResponse({
+            'messages': [{**message.to_data(), 'you': message.author_id == request.user.id} for message in messages],
+            'has_more': has_more,
+        })
+
+
 @method_decorator(csrf_exempt, name='dispatch')
 class MessageCreateView(View):
+    @transaction.atomic
     def post(self, request, *args, **kwargs):
         chat = Chat.objects.get(id=request.POST.get('chat_id'))
         Message.objects.create(author=request.user, content=request.POST.get('content'), chat=chat,
@@ -185,25 +250,15 @@ class MessageCreateView(View):
 @method_decorator(csrf_exempt, name='dispatch')
 class PostUpView(View):
     def post(self, request, *args, **kwargs):
-        _post = Post.objects.get(id=request.POST.get('post_id'))
-        if request.user in _post.vote_up.all():
-            _post.vote_up.remove(request.user)
-        else:
-            _post.vote_up.add(request.user)
-            _post.vote_down.remove(request.user)
-        return HttpResponse('OK')
+        _post = Post.objects.only('id', 'author_id').get(id=request.POST.get('post_id'))
+        return JsonResponse(_post.toggle_vote(request.user, up=True))
 
 
 @method_decorator(csrf_exempt, name='dispatch')
 class PostDownView(View):
     def post(self, request, *args, **kwargs):
-        _post = Post.objects.get(id=request.POST.get('post_id'))
-        if request.user in _post.vote_down.all():
-            _post.vote_down.remove(request.user)
-        else:
-            _post.vote_down.add(request.user)
-            _post.vote_up.remove(request.user)
-        return HttpResponse('OK')
+        _post = Post.objects.only('id', 'author_id').get(id=request.POST.get('post_id'))
+        return JsonResponse(_post.toggle_vote(request.user, up=False))
 
 
 class PostCreateView(CreateView):
@@ -215,6 +270,7 @@ class PostCreateView(CreateView):
     def get_context_data(self, **kwargs):
         return {'form': PostForm()}
 
+    @transaction.atomic
     def form_valid(self, form):
         obj = form.save(commit=False)
         obj.author = self.request.user
@@ -228,6 +284,7 @@ class ChatCreateView(CreateView):
     fields = ['content', 'recipient']
     success_url = reverse_lazy('messenger')
 
+    @transaction.atomic
     def form_valid(self, form):
         obj = form.save(commit=False)
         obj.author = self.request.user
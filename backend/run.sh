@@ -2,5 +2,7 @@
 
 python3 manage.py makemigrations
 python3 manage.py migrate
+python3 manage.py rebuild_chats --if-needed
+python3 manage.py rebuild_reputation --if-needed
 python3 manage.py collectstatic --noinput
 daphne -b 0.0.0.0 rush01.asgi:application
\ No newline at end of file
@@ -19,15 +19,20 @@ from django.core.asgi import get_asgi_application
 from channels.routing import ProtocolTypeRouter, URLRouter
 from django.urls import re_path
 
-from .middleware import AuthMiddlewareFromPath
+from django.conf import settings
+
+from .middleware import AuthMiddlewareFromSession, OutboxDispatcherMiddleware
 
 from ws.notifications import NotificationsConsumer
 from ws.chat import ChatConsumer
 
 application = ProtocolTypeRouter({
     "http": get_asgi_application(),
-    "websocket": AuthMiddlewareFromPath(URLRouter([
+    "websocket": AuthMiddlewareFromSession(URLRouter([
         re_path(r'^notifications/(?P<user_id>[\d]+)/', NotificationsConsumer.as_asgi()),
         re_path(r'^chat/(?P<user_id>[\d]+)/', ChatConsumer.as_asgi()),
     ])),
 })
+
+if settings.OUTBOX_DISPATCHER == 'inprocess':
+    application = OutboxDispatcherMiddleware(application)
@@ -0,0 +1,20 @@
+from django.conf import settings
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    SQLite tuned for concurrent writers, see ``settings.SQLITE_PRAGMAS``
+
+    Transactions start with ``BEGIN IMMEDIATE``: a deferred transaction that reads before writing
+    fails with ``database is locked`` right away when another writer commits first, without waiting for the busy timeout
+    """
+
+    def get_new_connection(self, conn_params):
+        conn = super(DatabaseWrapper, self).get_new_connection(conn_params)
+        for pragma, value in settings.SQLITE_PRAGMAS.items():
+            conn.execute(f'PRAGMA {pragma} = {value}')
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute('BEGIN IMMEDIATE')
@@ -1,19 +1,39 @@
-from asgiref.sync import sync_to_async
-from django.contrib.auth import get_user_model
+from django.conf import settings
 from django.contrib.auth.models import AnonymousUser
+from django.http.cookie import parse_cookie
 
-User = get_user_model()
+from forum.outbox import dispatcher
+from ws.users import get_user_async
 
 
-class AuthMiddlewareFromPath:
+class AuthMiddlewareFromSession:
+    """
+    User of the Django session cookie, resolved through :data:`ws.users.user_cache`
+
+    User id in the path is kept for old clients and must match the session user
+    """
     def __init__(self, inner):
         self.inner = inner
 
     async def __call__(self, scope, receive, send):
         scope['user'] = AnonymousUser()
         try:
-            user_id = scope['path'].split('/')[-2]
-            scope['user'] = await sync_to_async(lambda: User.objects.get(id=user_id))()
+            cookies = parse_cookie(dict(scope.get('headers', [])).get(b'cookie', b'').decode('latin1'))
+            session_key = cookies.get(settings.SESSION_COOKIE_NAME)
+            user = await get_user_async('session', session_key) if session_key else None
+            path_user_id = scope['path'].rstrip('/').split('/')[-1]
+            if user is not None and (not path_user_id.isdigit() or int(path_user_id) == user.id):
+                scope['user'] = user
         except Exception:
             ...
         return await self.inner(scope, receive, send)
+
+
+class OutboxDispatcherMiddleware:
+    """Start :data:`forum.outbox.dispatcher` in the server event loop on the first connection"""
+    def __init__(self, inner):
+        self.inner = inner
+
+    async def __call__(self, scope, receive, send):
+        dispatcher.start()
+        return await self.inner(scope, receive, send)
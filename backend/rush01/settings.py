@@ -10,8 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/3.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+import django
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -60,6 +63,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'forum.context_processors.navbar',
             ],
         },
     },
@@ -70,11 +74,43 @@ WSGI_APPLICATION = 'rush01.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/3.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# sqlite - single file tuned for concurrent daphne threads, postgres - persistent connections checked on every request
+
+DATABASE = os.environ.get('DATABASE', 'sqlite')
+
+SQLITE_TUNED = os.environ.get('SQLITE_TUNED', '1') == '1'  #: Use rush01.backends.sqlite3 instead of stock backend
+
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',  #: Readers do not block the writer and the writer does not block readers
+    'synchronous': 'NORMAL',  #: Safe with WAL, fsync on checkpoint only
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'MEMORY',
+}
+
+
+def database():
+    if DATABASE == 'postgres':
+        return {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('POSTGRES_DB', 'rush01'),
+            'USER': os.environ.get('POSTGRES_USER', 'rush01'),
+            'PASSWORD': os.environ.get('POSTGRES_PASSWORD', ''),
+            'HOST': os.environ.get('POSTGRES_HOST', 'localhost'),
+            'PORT': os.environ.get('POSTGRES_PORT', '5432'),
+            'CONN_MAX_AGE': int(os.environ.get('POSTGRES_CONN_MAX_AGE', 600)),
+            'CONN_HEALTH_CHECKS': True,
+        }
+    return {
+        'ENGINE': 'rush01.backends.sqlite3' if SQLITE_TUNED else 'django.db.backends.sqlite3',
+        'NAME': os.environ.get('SQLITE_PATH', BASE_DIR / 'db.sqlite3'),
+        'OPTIONS': {
+            'timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT', 20)),  #: Seconds a writer waits for the lock
+        },
     }
+
+
+DATABASES = {
+    'default': database(),
 }
 
 # Password validation
@@ -122,12 +158,104 @@ INSTALLED_APPS += ['bootstrap3', 'forum', 'channels']
 
 ASGI_APPLICATION = 'rush01.asgi.application'
 
-CHANNEL_LAYERS = {
-    "default": {
-        "BACKEND": "channels.layers.InMemoryChannelLayer"
+# Channel layers
+# memory - single process only, redis - shared between processes, sharded over every host in CHANNEL_REDIS_HOSTS
+
+CHANNEL_LAYER = os.environ.get('CHANNEL_LAYER', 'memory')
+
+CHANNEL_REDIS_HOSTS = os.environ.get('CHANNEL_REDIS_HOSTS', 'redis://localhost:6379').split(',')
+
+
+def channel_layer(capacity=100, expiry=60, group_expiry=86400):
+    if CHANNEL_LAYER == 'redis':
+        return {
+            "BACKEND": "channels_redis.core.RedisChannelLayer",
+            "CONFIG": {
+                "hosts": CHANNEL_REDIS_HOSTS,
+                "capacity": capacity,
+                "expiry": expiry,
+                "group_expiry": group_expiry,
+            }
+        }
+    return {
+        "BACKEND": "channels.layers.InMemoryChannelLayer",
+        "CONFIG": {
+            "capacity": capacity,
+            "expiry": expiry,
+            "group_expiry": group_expiry,
+        }
     }
+
+
+CHANNEL_LAYERS = {
+    "default": channel_layer(),
+    "chat": channel_layer(capacity=200, expiry=30, group_expiry=2 * 60 * 60),  #: Chat consumers and messages
+    "notifications": channel_layer(capacity=500, expiry=10, group_expiry=2 * 60 * 60),  #: Notification consumers
+}
+
+# Cache of navbar summaries, unread counters and websocket presence
+# Shared redis cache with the redis channel layer, since HTTP and websocket processes must see the same counters,
+# local memory cache of the single process otherwise
+
+CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL', f'{CHANNEL_REDIS_HOSTS[0].rstrip("/")}/1')
+
+
+def cache_backend():
+    if CHANNEL_LAYER == 'redis':
+        return {
+            "BACKEND": 'django.core.cache.backends.redis.RedisCache' if django.VERSION >= (4, 0)
+            else 'django_redis.cache.RedisCache',
+            "LOCATION": CACHE_REDIS_URL,
+        }
+    return {"BACKEND": 'django.core.cache.backends.locmem.LocMemCache'}
+
+
+CACHES = {
+    "default": cache_backend(),
 }
 
+# In-process user lookup cache of websocket layer, see ws.users.UserCache
+
+WS_USER_CACHE_SIZE = int(os.environ.get('WS_USER_CACHE_SIZE', 4096))
+
+WS_USER_CACHE_TTL = int(os.environ.get('WS_USER_CACHE_TTL', 60))
+
+# Live channels of websocket users, see ws.presence.Presence
+# Skipping events of offline users needs a cache shared by HTTP and websocket processes, see CACHES
+
+WS_PRESENCE_TTL = int(os.environ.get('WS_PRESENCE_TTL', 90))
+
+WS_PRESENCE_HEARTBEAT = int(os.environ.get('WS_PRESENCE_HEARTBEAT', 30))
+
+WS_PRESENCE_SKIP_OFFLINE = os.environ.get('WS_PRESENCE_SKIP_OFFLINE', '1') == '1'
+
+# Bounded queue of outgoing frames of every websocket connection, see ws.outbound.OutboundQueue
+# Frames wait in the queue while the client has WS_OUTBOUND_WINDOW frames unacknowledged, clients that never ack
+# are not bounded since ASGI servers buffer frames of slow sockets without limit
+# drop_oldest, coalesce - replace queued frame of the same event before dropping the oldest,
+# disconnect - close slow clients
+
+WS_OUTBOUND_QUEUE_SIZE = int(os.environ.get('WS_OUTBOUND_QUEUE_SIZE', 100))
+
+WS_OUTBOUND_WINDOW = int(os.environ.get('WS_OUTBOUND_WINDOW', 50))
+
+WS_OUTBOUND_POLICY = os.environ.get('WS_OUTBOUND_POLICY', 'coalesce')
+
+# Seconds NotificationsConsumer batches notifications of the same kind into one frame, 0 sends every notification
+
+WS_NOTIFICATION_WINDOW = float(os.environ.get('WS_NOTIFICATION_WINDOW', 1))
+
+# Realtime events outbox, see forum.outbox
+# inprocess - dispatched inside the ASGI server loop, command - by separate ``manage.py dispatch_outbox`` processes
+
+OUTBOX_DISPATCHER = os.environ.get('OUTBOX_DISPATCHER', 'inprocess')
+
+OUTBOX_BATCH_SIZE = int(os.environ.get('OUTBOX_BATCH_SIZE', 100))
+
+OUTBOX_POLL_INTERVAL = float(os.environ.get('OUTBOX_POLL_INTERVAL', 1))
+
+OUTBOX_MAX_ATTEMPTS = int(os.environ.get('OUTBOX_MAX_ATTEMPTS', 10))
+
 STATIC_ROOT = BASE_DIR / 'static'
 
 AUTH_USER_MODEL = 'forum.User'
@@ -19,9 +19,12 @@ from django.contrib import admin
 from django.urls import path, include, reverse_lazy
 from django.views.generic import RedirectView
 
+from ws.views import stats as ws_stats
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('forum/', include('forum.urls')),
+    path('ws/stats/', ws_stats, name='ws_stats'),
     path('', RedirectView.as_view(url=reverse_lazy('home')))
 ]
 
@@ -3,112 +3,238 @@ Websocket: Base
 ====================================
 Base websocket consumer
 """
+import asyncio
 import dataclasses
 import json
+import time
 from dataclasses import dataclass
 from functools import wraps
 from typing import Callable, Any
 
-from asgiref.sync import async_to_sync
+import msgpack
+from asgiref.sync import async_to_sync, sync_to_async
 from channels.consumer import get_handler_name
-from channels.generic.websocket import JsonWebsocketConsumer
+from channels.db import database_sync_to_async
+from channels.generic.websocket import JsonWebsocketConsumer, AsyncJsonWebsocketConsumer
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import AnonymousUser
 from django.core.cache import cache
 
+from .outbound import outbound_queue, metrics as outbound_metrics, SLOW_CONSUMER_CLOSE_CODE
+from .presence import presence
+from .users import user_cache, get_user_async
 from .utils import safe
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 User = get_user_model()
 
 
 def auth(f):
-    def wrapper(self, *args, **kwargs):
-        try:
-            user = self.get_user()
-            if user.is_anonymous:
-                self.close()
-            self.accept()
-            return f(self)
-        except Exception:
-            ...
+    if asyncio.iscoroutinefunction(f):
+        async def wrapper(self, *args, **kwargs):
+            try:
+                user = await self.get_user()
+                if user.is_anonymous:
+                    return await self.close()  # Rejects the handshake, socket is never accepted
+                await self.accept()
+                return await f(self)
+            except Exception:
+                ...
+    else:
+        def wrapper(self, *args, **kwargs):
+            try:
+                user = self.get_user()
+                if user.is_anonymous:
+                    return self.close()  # Rejects the handshake, socket is never accepted
+                self.accept()
+                return f(self)
+            except Exception:
+                ...
 
     wrapper.__doc__ = f.__doc__
     return wrapper
 
 
 def check_auth(f):
-    def wrapper(self, *args, **kwargs):
-        try:
-            user = self.get_user()
-            if not user.is_anonymous:
-                return f(self, *args, **kwargs)
-        except Exception:
-            ...
+    if asyncio.iscoroutinefunction(f):
+        async def wrapper(self, *args, **kwargs):
+            try:
+                user = await self.get_user()
+                if not user.is_anonymous:
+                    return await f(self, *args, **kwargs)
+            except Exception:
+                ...
+    else:
+        def wrapper(self, *args, **kwargs):
+            try:
+                user = self.get_user()
+                if not user.is_anonymous:
+                    return f(self, *args, **kwargs)
+            except Exception:
+                ...
 
     wrapper.__doc__ = f.__doc__
     return wrapper
 
 
 def check_payload(f):
-    @wraps(f)
-    def wrapper(self: BaseConsumer, *args, **kwargs):
-        try:
-            return f(self, *args, **kwargs)
-        except AttributeError as e:
-            required_payload = str(e).split('attribute')[1].strip().replace("'", '')
-            event = {
-                'system': self.get_systems().to_data(),
-                'params': {}
-            }
-
-            def action_for_initiator(message: Message, payload):
-                return Action(
-                    event=ActionsEnum.error,
-                    params=ResponsePayloads.PayloadSignatureWrong(required=required_payload).to_data(),
-                    system=self.get_systems()
-                )
-
-            self.send_broadcast(event, action_for_initiator=action_for_initiator)
+    def payload_wrong(self, e: AttributeError):
+        required_payload = str(e).split('attribute')[1].strip().replace("'", '')
+        event = {
+            'system': self.get_systems().to_data(),
+            'params': {}
+        }
+
+        def action_for_initiator(message: Message, payload):
+            return Action(
+                event=ActionsEnum.error,
+                params=ResponsePayloads.PayloadSignatureWrong(required=required_payload).to_data(),
+                system=self.get_systems()
+            )
+
+        return self.send_broadcast(event, action_for_initiator=action_for_initiator)
+
+    if asyncio.iscoroutinefunction(f):
+        @wraps(f)
+        async def wrapper(self: AsyncBaseConsumer, *args, **kwargs):
+            try:
+                return await f(self, *args, **kwargs)
+            except AttributeError as e:
+                await payload_wrong(self, e)
+    else:
+        @wraps(f)
+        def wrapper(self: BaseConsumer, *args, **kwargs):
+            try:
+                return f(self, *args, **kwargs)
+            except AttributeError as e:
+                payload_wrong(self, e)
 
     wrapper.__doc__ = f.__doc__
     return wrapper
 
 
+def recipient_error(message: 'Message', payload: 'BasePayload'):
+    return Action(
+        event=ActionsEnum.error,
+        params=payload.to_data(),
+        system=ActionSystem(**message.system.to_data())
+    )
+
+
 def check_recipient(f):
-    def wrapper(message: Message, payload: BasePayload, *args, **kwargs):
-        if message.target_user:
-            return f(message, payload, *args, **kwargs)
-        else:
-            action = Action(
-                event=ActionsEnum.error,
-                params=ResponsePayloads.RecipientNotExist().to_data(),
-                system=ActionSystem(**message.system.to_data())
-            )
-            return action
+    if asyncio.iscoroutinefunction(f):
+        async def wrapper(message: Message, payload: BasePayload, *args, **kwargs):
+            if await message.get_target_user():
+                return await f(message, payload, *args, **kwargs)
+            return recipient_error(message, ResponsePayloads.RecipientNotExist())
+    else:
+        def wrapper(message: Message, payload: BasePayload, *args, **kwargs):
+            if message.target_user:
+                return f(message, payload, *args, **kwargs)
+            return recipient_error(message, ResponsePayloads.RecipientNotExist())
 
     wrapper.__doc__ = f.__doc__
     return wrapper
 
 
 def check_recipient_not_me(f):
-    def wrapper(message: Message, payload: BasePayload, *args, **kwargs):
-        if message.target_user != message.initiator_user:
-            return f(message, payload, *args, **kwargs)
-        else:
-            action = Action(
-                event=ActionsEnum.error,
-                params=ResponsePayloads.RecipientIsMe().to_data(),
-                system=ActionSystem(**message.system.to_data())
-            )
-            return action
+    if asyncio.iscoroutinefunction(f):
+        async def wrapper(message: Message, payload: BasePayload, *args, **kwargs):
+            if await message.get_target_user() != await message.get_initiator_user():
+                return await f(message, payload, *args, **kwargs)
+            return recipient_error(message, ResponsePayloads.RecipientIsMe())
+    else:
+        def wrapper(message: Message, payload: BasePayload, *args, **kwargs):
+            if message.target_user != message.initiator_user:
+                return f(message, payload, *args, **kwargs)
+            return recipient_error(message, ResponsePayloads.RecipientIsMe())
 
     wrapper.__doc__ = f.__doc__
     return wrapper
 
 
+class Codec:
+    """Wire format of websocket frames, negotiated by websocket subprotocol"""
+    name: str = None  #: Codec name, key of prepared frames
+    subprotocol: str = None  #: Subprotocol name client asks for, ``None`` for default codec
+    binary: bool = False  #: Send binary frames instead of text frames
+
+    def encode(self, data):
+        raise NotImplementedError
+
+    def decode(self, frame):
+        raise NotImplementedError
+
+    def frame(self, data) -> dict:
+        """Keyword arguments for consumer ``send``"""
+        return self.prepared_frame(self.encode(data))
+
+    def prepared_frame(self, encoded) -> dict:
+        return {'bytes_data' if self.binary else 'text_data': encoded}
+
+
+class JsonCodec(Codec):
+    """JSON text frames, uses orjson when installed"""
+    name = 'json'
+
+    def encode(self, data) -> str:
+        if orjson:
+            return orjson.dumps(data, default=lambda o: o.__dict__).decode()
+        return _json_encoder.encode(data)
+
+    def decode(self, frame):
+        if orjson:
+            return orjson.loads(frame)
+        return json.loads(frame)
+
+
+class MsgpackCodec(Codec):
+    """Msgpack binary frames"""
+    name = 'msgpack'
+    subprotocol = 'msgpack'
+    binary = True
+
+    def encode(self, data) -> bytes:
+        return msgpack.packb(data, default=lambda o: o.__dict__)
+
+    def decode(self, frame):
+        return msgpack.unpackb(frame.encode() if isinstance(frame, str) else frame)
+
+
+_json_encoder = json.JSONEncoder(separators=(',', ':'), check_circular=False, default=lambda o: o.__dict__)
+
+json_codec = JsonCodec()  #: Default codec
+
+CODECS = {codec.subprotocol: codec for codec in (json_codec, MsgpackCodec())}  #: Codecs by subprotocol
+
+
+def encode_frames(action: 'Action') -> dict:
+    """
+    Encode action once per codec for :obj:`TargetsEnum.for_all` broadcasts
+
+    Put the result into event ``frames``, consumers forward it with ``send_prepared`` without building the action again
+    """
+    data = action.to_data()
+    data.pop('system')
+    return {codec.name: codec.encode(data) for codec in CODECS.values()}
+
+
+def negotiate_codec(subprotocols) -> Codec:
+    """First codec supported from client's subprotocols, :obj:`json_codec` if none"""
+    for subprotocol in subprotocols or []:
+        if subprotocol in CODECS:
+            return CODECS[subprotocol]
+    return json_codec
+
+
 class ActionsEnum:
     """List of existed actions"""
     error = 'error'  #: :func:`BaseConsumer.error`
+    ack = 'ack'  #: Frames received by the client, see :class:`.OutboundQueue`
 
 
 @dataclass
@@ -137,7 +263,7 @@ class Action:
             system=self.system
         ).to_data()
         if to_json:
-            return json.dumps(data)
+            return json_codec.encode(data)
         return data
 
     def to_system_data(self):
@@ -218,15 +344,24 @@ class Message:
 
     @property
     def initiator_user(self) -> User:
-        return User.objects.get(id=self.system.initiator_user_id)
+        return user_cache.get_by_id(self.system.initiator_user_id)
 
     @property
     def target_user(self) -> User:
         # TODO Add extend lookup logic for child Consumer
         if self.to_user_id:
-            return User.objects.filter(id=self.to_user_id).first()
+            return user_cache.get_by_id(self.to_user_id)
+        if self.to_username:
+            return user_cache.get_by_username(self.to_username)
+
+    async def get_initiator_user(self) -> User:
+        return await get_user_async('id', self.system.initiator_user_id)
+
+    async def get_target_user(self) -> User:
+        if self.to_user_id:
+            return await get_user_async('id', self.to_user_id)
         if self.to_username:
-            return User.objects.filter(username=self.to_username).first()
+            return await get_user_async('username', self.to_username)
 
     @property
     def before_send_activated(self):
@@ -245,7 +380,7 @@ class BasePayload:
         self.__dict__.update(kwargs)
 
     def __str__(self):
-        return json.dumps(self.to_data())
+        return json_codec.encode(self.to_data())
 
     def to_data(self):
         return self.__dict__
@@ -284,31 +419,123 @@ class ResponsePayloads:
         message: str  #: Error message
 
 
-def user_cache_key(user: User):
-    return f'user-{user.id}'
+def get_system_cache(user: User, group_name: str = 'notifications'):
+    """System of user's latest live channel in the broadcast group, events it causes are not echoed back to it"""
+    channels = presence.channels(group_name, user.id)
+    return ActionSystem(initiator_channel=channels[-1], initiator_user_id=user.id).to_data() if channels else {}
 
 
-def get_system_cache(user: User):
-    return cache.get(user_cache_key(user), {})
+def user_group_name(group_name: str, user_id: int):
+    """Personal group of user's consumers inside broadcast group, used for :obj:`TargetsEnum.for_user` events"""
+    return f'{group_name}-user-{user_id}'
 
 
-class BaseConsumer(JsonWebsocketConsumer):
+class ConsumerMixin:
+    """State and helpers shared by :class:`BaseConsumer` and :class:`AsyncBaseConsumer`, never touch the database"""
     broadcast_group = None
 
+    @property
+    def codec(self) -> Codec:
+        if not hasattr(self, '_codec'):
+            self._codec = negotiate_codec(self.scope.get('subprotocols'))
+        return self._codec
+
+    @property
+    def user_group(self):
+        user = self.scope.get('user')
+        if self.broadcast_group and user and not user.is_anonymous:
+            return user_group_name(self.broadcast_group, user.id)
+
+    @property
+    def presence_user_id(self):
+        user = self.scope.get('user', AnonymousUser())
+        if self.broadcast_group and not user.is_anonymous:
+            return user.id
+
+    def join_presence(self):
+        if self.presence_user_id:
+            presence.connect(self.broadcast_group, self.presence_user_id, self.channel_name)
+            self._presence_touched = time.monotonic()
+
+    def touch_presence(self, force: bool = False):
+        """Presence heartbeat, at most once per :attr:`.Presence.heartbeat` unless forced"""
+        touched = getattr(self, '_presence_touched', None)
+        if touched is None or not (force or time.monotonic() - touched >= presence.heartbeat):
+            return
+        presence.touch(self.broadcast_group, self.presence_user_id, self.channel_name)
+        self._presence_touched = time.monotonic()
+
+    def leave_presence(self):
+        if getattr(self, '_presence_touched', None) is not None:
+            presence.disconnect(self.broadcast_group, self.presence_user_id, self.channel_name)
+            self._presence_touched = None
+
+    def get_systems(self) -> ActionSystem:
+        return ActionSystem(initiator_channel=self.channel_name, initiator_user_id=self.scope['user'].id)
+
+    def parse_action(self, content):
+        """Client action or error action for the client"""
+        try:
+            action = Action(**content, system=self.get_systems())
+        except TypeError as e:
+            unexpected = str(e).split('argument')[1].strip().replace("'", '')
+            return None, Action(
+                event=ActionsEnum.error,
+                params=ResponsePayloads.ActionSignatureWrong(unexpected=unexpected).to_data(),
+                system=self.get_systems()
+            )
+        if not getattr(self, get_handler_name(action.to_system_data()), None):
+            return None, Action(
+                event=ActionsEnum.error,
+                params=ResponsePayloads.ActionNotExist().to_data(),
+                system=self.get_systems()
+            )
+        return action, None
+
+    def build_message(self, event, target):
+        payload = BasePayload(**event['params'])
+        message = Message(
+            **payload.to_data(),
+            system=MessageSystem(
+                **ActionSystem(**event['system']).to_data(),
+                receiver_channel=self.channel_name
+            ),
+            user=self.scope['user'],
+            target=target
+        )
+        return message, payload
+
+
+class BaseConsumer(ConsumerMixin, JsonWebsocketConsumer):
     def connect(self):
-        self.cache_system()
+        self.join_presence()
         self.join_group(self.broadcast_group)
+        self.join_group(self.user_group)
+
+    def disconnect(self, code):
+        self.leave_presence()
+        self.leave_group(self.broadcast_group)
+        self.leave_group(self.user_group)
+
+    def accept(self, subprotocol=None):
+        super(BaseConsumer, self).accept(subprotocol or self.codec.subprotocol)
 
     def send_json(self, content, close=False):
         if 'system' in content:
             content.pop('system')
-        super(BaseConsumer, self).send_json(content, close)
-
-    def cache_system(self):
-        cache.set(user_cache_key(self.get_user()), self.get_systems().to_data(), 40 * 60)
+        self.send(**self.codec.frame(content), close=close)
 
     def get_user(self, user_id: int = None) -> User:
-        return User.objects.get(id=user_id) if user_id else self.scope.get('user', AnonymousUser())
+        return user_cache.get_by_id(user_id) if user_id else self.scope.get('user', AnonymousUser())
+
+    def send_prepared(self, event) -> bool:
+        """Forward frame encoded by :func:`encode_frames` to everyone except initiator, ``False`` if not prepared"""
+        frames = event.get('frames')
+        if not frames:
+            return False
+        if event['system'].get('initiator_channel') != self.channel_name:
+            self.send(**self.codec.prepared_frame(frames[self.codec.name]))
+        return True
 
     def join_group(self, group_name: str):
         if group_name:
@@ -318,12 +545,10 @@ class BaseConsumer(JsonWebsocketConsumer):
         if group_name:
             async_to_sync(self.channel_layer.group_discard)(group_name, self.channel_name)
 
-    def get_systems(self) -> ActionSystem:
-        return ActionSystem(initiator_channel=self.channel_name, initiator_user_id=self.scope['user'].id)
-
     @safe
-    def receive(self, *arg, **kwargs):
-        super().receive(*arg, **kwargs)
+    def receive(self, text_data=None, bytes_data=None, **kwargs):
+        self.touch_presence()  # Sync consumers have no timer, idle sockets expire after Presence.ttl
+        self.receive_json(self.codec.decode(text_data if text_data is not None else bytes_data), **kwargs)
 
     @safe
     def send(self, *arg, **kwargs):
@@ -331,28 +556,32 @@ class BaseConsumer(JsonWebsocketConsumer):
 
     def receive_json(self, content, **kwargs):
         if self.broadcast_group:
-            try:
-                action = Action(**content, system=self.get_systems())
-            except TypeError as e:
-                unexpected = str(e).split('argument')[1].strip().replace("'", '')
-                action = Action(
-                    event=ActionsEnum.error,
-                    params=ResponsePayloads.ActionSignatureWrong(unexpected=unexpected).to_data(),
-                    system=self.get_systems()
-                )
-                self.send_json(content=action.to_data())
+            action, error = self.parse_action(content)
+            if error:
+                self.send_json(content=error.to_data())
                 return
-            if action:
-                action_handler = getattr(self, get_handler_name(action.to_system_data()), None)
-                if not action_handler:
-                    action = Action(
-                        event=ActionsEnum.error,
-                        params=ResponsePayloads.ActionNotExist().to_data(),
-                        system=self.get_systems()
-                    )
-                    self.send_json(content=action.to_data())
-                    return
-                async_to_sync(self.channel_layer.group_send)(self.broadcast_group, action.to_system_data())
+            self.route_action(action)
+
+    def route_action(self, action: Action):
+        """
+        Deliver client action to consumers which can handle it
+
+        Actions with ``to_user_id`` or ``to_username`` go only to recipient's :attr:`user_group`
+        and to the initiator, other actions go to the whole broadcast group
+        """
+        params = action.params if isinstance(action.params, dict) else {}
+        if 'to_user_id' not in params and 'to_username' not in params:
+            async_to_sync(self.channel_layer.group_send)(self.broadcast_group, action.to_system_data())
+            return
+        target = user_cache.get_by_id(params['to_user_id']) if params.get('to_user_id') \
+            else user_cache.get_by_username(params.get('to_username'))
+        target_id = target.id if target else None
+        if target_id:
+            async_to_sync(self.channel_layer.group_send)(
+                user_group_name(self.broadcast_group, target_id), action.to_system_data()
+            )
+        if str(target_id) != str(self.scope['user'].id):
+            async_to_sync(self.channel_layer.send)(self.channel_name, action.to_system_data())
 
     def send_to_group(self, action: Action, group_name: str = None):
         async_to_sync(
@@ -362,21 +591,12 @@ class BaseConsumer(JsonWebsocketConsumer):
     @safe
     def send_broadcast(self, event, action_for_target: Callable = None, action_for_initiator: Callable = None,
                        target=TargetsEnum.for_user, before_send: Callable = None, system_before_send: Callable = None):
-        payload = BasePayload(**event['params'])
-        message = Message(
-            **payload.to_data(),
-            system=MessageSystem(
-                **ActionSystem(**event['system']).to_data(),
-                receiver_channel=self.channel_name
-            ),
-            user=self.scope['user'],
-            target=target
-        )
+        message, payload = self.build_message(event, target)
 
         if system_before_send:
             system_before_send()
 
-        if (message.target == TargetsEnum.for_user and not message.target_user) and message.is_initiator:
+        if message.is_initiator and (message.target == TargetsEnum.for_user and not message.target_user):
             action = Action(
                 event=ActionsEnum.error,
                 params=ResponsePayloads.RecipientNotExist().to_data(),
@@ -428,3 +648,201 @@ class BaseConsumer(JsonWebsocketConsumer):
             )
 
         self.send_broadcast(event, action_for_initiator=action_for_initiator)
+
+
+async def call_action(f: Callable, *args):
+    """Await coroutine callbacks in the event loop, sync callbacks may touch the database so run in a thread"""
+    if asyncio.iscoroutinefunction(f):
+        return await f(*args)
+    return await database_sync_to_async(f)(*args)
+
+
+def cache_io(f: Callable) -> Callable:
+    """Coroutine running f in a worker thread, for blocking cache calls of async consumers"""
+    return sync_to_async(f, thread_sensitive=False)
+
+
+class AsyncBaseConsumer(ConsumerMixin, AsyncJsonWebsocketConsumer):
+    """
+    Native async version of :class:`BaseConsumer` with the same actions, payloads and broadcast semantics
+
+    Handlers and ``action_for_*`` callbacks should be coroutines,
+    sync callbacks still work but are offloaded to the database thread
+
+    Frames go through a bounded :class:`.OutboundQueue` once the socket is accepted
+    """
+    coalesce_events = ()  #: Events whose latest frame supersedes queued ones, see :obj:`.OutboundPolicy.coalesce`
+
+    async def connect(self):
+        await cache_io(self.join_presence)()
+        if self.presence_user_id:
+            self._heartbeat = asyncio.ensure_future(self.heartbeat())
+        await self.join_group(self.broadcast_group)
+        await self.join_group(self.user_group)
+
+    async def disconnect(self, code):
+        if getattr(self, '_heartbeat', None):
+            self._heartbeat.cancel()
+        self.stop_outbound()
+        await cache_io(self.leave_presence)()
+        await self.leave_group(self.broadcast_group)
+        await self.leave_group(self.user_group)
+
+    async def heartbeat(self):
+        """Keep channel live in :data:`.presence` while the socket is open, idle sockets included"""
+        while True:
+            await asyncio.sleep(presence.heartbeat)
+            await cache_io(self.touch_presence)(force=True)
+
+    async def accept(self, subprotocol=None):
+        await super(AsyncBaseConsumer, self).accept(subprotocol or self.codec.subprotocol)
+        self.outbound = outbound_queue()
+        self._writer = asyncio.ensure_future(self.write_outbound())
+
+    async def write_outbound(self):
+        """Send queued frames one by one, only this connection waits for a slow client"""
+        while True:
+            frame = await self.outbound.get()
+            try:
+                await super(AsyncBaseConsumer, self).send(**frame)
+            except Exception:  # Connection is broken, later frames are dropped until disconnect
+                self._writer = None
+                self.outbound.clear()
+                return
+            outbound_metrics.sent += 1
+
+    def stop_outbound(self):
+        if getattr(self, '_writer', None):
+            self._writer.cancel()
+            self.outbound.clear()
+            self._writer = None
+
+    async def send_json(self, content, close=False):
+        if 'system' in content:
+            content.pop('system')
+        key = content.get('event') if content.get('event') in self.coalesce_events else None
+        await self.send(**self.codec.frame(content), close=close, key=key)
+
+    async def get_user(self, user_id: int = None) -> User:
+        return await get_user_async('id', user_id) if user_id else self.scope.get('user', AnonymousUser())
+
+    async def send_prepared(self, event) -> bool:
+        """Same as :func:`BaseConsumer.send_prepared`"""
+        frames = event.get('frames')
+        if not frames:
+            return False
+        if event['system'].get('initiator_channel') != self.channel_name:
+            name = get_handler_name(event)
+            await self.send(**self.codec.prepared_frame(frames[self.codec.name]),
+                            key=name if name in self.coalesce_events else None)
+        return True
+
+    async def join_group(self, group_name: str):
+        if group_name:
+            await self.channel_layer.group_add(group_name, self.channel_name)
+
+    async def leave_group(self, group_name: str):
+        if group_name:
+            await self.channel_layer.group_discard(group_name, self.channel_name)
+
+    @safe
+    async def receive(self, text_data=None, bytes_data=None, **kwargs):
+        await self.receive_json(self.codec.decode(text_data if text_data is not None else bytes_data), **kwargs)
+
+    @safe
+    async def send(self, text_data=None, bytes_data=None, close=False, key: str = None):
+        """Queue frame for :func:`write_outbound`, ``key`` marks frames a newer one of the same key may replace"""
+        if not getattr(self, '_writer', None):
+            if getattr(self, 'outbound', None) is None:  # Not accepted yet
+                await super().send(text_data=text_data, bytes_data=bytes_data, close=close)
+            return
+        if not self.outbound.put({'text_data': text_data, 'bytes_data': bytes_data, 'close': close}, key):
+            self.stop_outbound()
+            await self.close(code=SLOW_CONSUMER_CLOSE_CODE)
+
+    async def receive_json(self, content, **kwargs):
+        if content.get('event') == ActionsEnum.ack:
+            if getattr(self, 'outbound', None) is not None:
+                self.outbound.ack((content.get('params') or {}).get('received', 0))
+            return
+        if self.broadcast_group:
+            action, error = self.parse_action(content)
+            if error:
+                await self.send_json(content=error.to_data())
+                return
+            await self.route_action(action)
+
+    async def route_action(self, action: Action):
+        """Same routing as :func:`BaseConsumer.route_action`"""
+        params = action.params if isinstance(action.params, dict) else {}
+        if 'to_user_id' not in params and 'to_username' not in params:
+            await self.channel_layer.group_send(self.broadcast_group, action.to_system_data())
+            return
+        target = await get_user_async('id', params['to_user_id']) if params.get('to_user_id') \
+            else await get_user_async('username', params.get('to_username'))
+        target_id = target.id if target else None
+        if target_id:
+            await self.channel_layer.group_send(user_group_name(self.broadcast_group, target_id),
+                                                action.to_system_data())
+        if str(target_id) != str(self.scope['user'].id):
+            await self.channel_layer.send(self.channel_name, action.to_system_data())
+
+    async def send_to_group(self, action: Action, group_name: str = None):
+        await self.channel_layer.group_send(self.broadcast_group if not group_name else group_name,
+                                            action.to_system_data())
+
+    @safe
+    async def send_broadcast(self, event, action_for_target: Callable = None, action_for_initiator: Callable = None,
+                             target=TargetsEnum.for_user, before_send: Callable = None,
+                             system_before_send: Callable = None):
+        message, payload = self.build_message(event, target)
+
+        if system_before_send:
+            await call_action(system_before_send)
+
+        if message.is_initiator and (message.target == TargetsEnum.for_user and not await message.get_target_user()):
+            action = Action(
+                event=ActionsEnum.error,
+                params=ResponsePayloads.RecipientNotExist().to_data(),
+                system=ActionSystem(**message.system.to_data())
+            )
+            await self.send_json(content=action.to_data())
+            return  # Interrupt action for initiator and action for target if recipient not found
+
+        async def before():
+            if before_send and not await cache_io(lambda: message.before_send_activated)():
+                act: Action = await call_action(before_send, message, payload)
+                if act:
+                    await self.send_json(content=act.to_data())
+                await cache_io(message.before_send_activate)()
+                return True
+            return False
+
+        for is_receiver, action_for in ((message.is_initiator, action_for_initiator),
+                                        (message.is_target, action_for_target)):
+            if is_receiver and action_for:
+                activated = await before()
+                action: Action = await call_action(action_for, message, payload)
+                if action:
+                    await self.send_json(content=action.to_data())
+                if before_send and not activated:  # Nothing to read or drop without before_send
+                    await cache_io(message.before_send_drop)()
+
+    async def error(self, event):
+        """
+        Show error message
+
+        Other Parameters
+        -------
+        Response Initiator
+            :obj:`.Action` :obj:`.ResponsePayloads.Error`
+        """
+
+        async def action_for_initiator(message: Message, payload: ResponsePayloads.Error):
+            return Action(
+                event=ActionsEnum.error,
+                params=ResponsePayloads.Error(message=payload.message).to_data(),
+                system=event['system']
+            )
+
+        await self.send_broadcast(event, action_for_initiator=action_for_initiator)
@@ -1,15 +1,16 @@
-from ws.base import BaseConsumer, TargetsEnum, Action, Message, auth, BasePayload
+from ws.base import AsyncBaseConsumer, TargetsEnum, Action, Message, auth, BasePayload
 
 
-class ChatConsumer(BaseConsumer):
+class ChatConsumer(AsyncBaseConsumer):
     broadcast_group = 'chat'
+    channel_layer_alias = 'chat'
 
     @auth
-    def connect(self):
-        super(ChatConsumer, self).connect()
+    async def connect(self):
+        await super(ChatConsumer, self).connect()
 
-    def message_send(self, event):
-        def action_for_target(message: Message, payload: BasePayload):
+    async def message_send(self, event):
+        async def action_for_target(message: Message, payload: BasePayload):
             return Action(event='message_show', system=event['system'], params=payload.to_data())
 
-        self.send_broadcast(event, action_for_target=action_for_target, target=TargetsEnum.for_user)
+        await self.send_broadcast(event, action_for_target=action_for_target, target=TargetsEnum.for_user)
@@ -1,21 +1,109 @@
-from ws.base import BaseConsumer, TargetsEnum, Action, Message, auth, BasePayload
+import asyncio
 
+from channels.db import database_sync_to_async
+from django.conf import settings
 
-class NotificationsConsumer(BaseConsumer):
+from forum.counters import unread_counts
+from ws.base import AsyncBaseConsumer, TargetsEnum, Action, ActionSystem, Message, auth, BasePayload
+
+BATCH_TITLES = 5  #: Latest titles sent in a batch of post notifications
+
+
+class NotificationsConsumer(AsyncBaseConsumer):
+    """
+    Forum and message notifications of a user
+
+    The first event opens a coalescing window of :attr:`coalesce_window` seconds and is sent right away,
+    events of the same kind inside the window are sent as one frame with ``count`` when it closes
+    """
     broadcast_group = 'notifications'
+    channel_layer_alias = 'notifications'
+    coalesce_events = ('notification_counters',)
+    coalesce_window = getattr(settings, 'WS_NOTIFICATION_WINDOW', 1.0)  #: Seconds, ``0`` sends every event
 
     @auth
-    def connect(self):
-        super(NotificationsConsumer, self).connect()
+    async def connect(self):
+        await super(NotificationsConsumer, self).connect()
+
+    async def disconnect(self, code):
+        for task in self.window_tasks:
+            task.cancel()
+        await super(NotificationsConsumer, self).disconnect(code)
+
+    @property
+    def windows(self) -> dict:
+        """Open coalescing windows, event to held params"""
+        if not hasattr(self, '_windows'):
+            self._windows = {}
+        return self._windows
+
+    @property
+    def window_tasks(self) -> set:
+        if not hasattr(self, '_window_tasks'):
+            self._window_tasks = set()
+        return self._window_tasks
+
+    @staticmethod
+    async def unread_counts(user):
+        return await database_sync_to_async(unread_counts)(user)
 
-    def post_created_notification(self, event):
-        def action_for_target(message: Message, payload: BasePayload):
+    def hold(self, event: str, params: dict) -> bool:
+        """Hold params for the open window of event, ``False`` when there is none and the event should be sent"""
+        if not self.coalesce_window:
+            return False
+        if event in self.windows:
+            self.windows[event].append(params)
+            return True
+        self.windows[event] = []
+        task = asyncio.ensure_future(self.close_window(event))
+        self.window_tasks.add(task)
+        task.add_done_callback(self.window_tasks.discard)
+        return False
+
+    async def close_window(self, event: str):
+        """Send held events as one frame every window until a window passes without events"""
+        while True:
+            await asyncio.sleep(self.coalesce_window)
+            held = self.windows[event]
+            if not held:
+                del self.windows[event]
+                return
+            self.windows[event] = []
+            batch = getattr(self, f'{event}_batch')
+            await self.send_json(content=Action(event=event, system=ActionSystem(), params=await batch(held)).to_data())
+
+    async def post_created_notification(self, event):
+        initiator = event['system'].get('initiator_channel') == self.channel_name
+        if not initiator and self.hold('post_created_notification', event['params']):
+            return
+        if await self.send_prepared(event):
+            return
+
+        async def action_for_target(message: Message, payload: BasePayload):
             return Action(event='post_created_notification', system=event['system'], params=payload.to_data())
 
-        self.send_broadcast(event, action_for_target=action_for_target, target=TargetsEnum.for_all)
+        await self.send_broadcast(event, action_for_target=action_for_target, target=TargetsEnum.for_all)
+
+    @staticmethod
+    async def post_created_notification_batch(held: list) -> dict:
+        return {'title': held[-1]['title'], 'titles': [params['title'] for params in held[-BATCH_TITLES:]],
+                'count': len(held)}
+
+    async def new_message_notification(self, event):
+        async def action_for_target(message: Message, payload: BasePayload):
+            if self.hold('new_message_notification', payload.to_data()):
+                return
+            return Action(event='new_message_notification', system=event['system'],
+                          params={**payload.to_data(), 'counters': await self.unread_counts(message.user)})
+
+        await self.send_broadcast(event, action_for_target=action_for_target, target=TargetsEnum.for_user)
+
+    async def new_message_notification_batch(self, held: list) -> dict:
+        return {**held[-1], 'count': len(held), 'counters': await self.unread_counts(self.scope['user'])}
 
-    def new_message_notification(self, event):
-        def action_for_target(message: Message, payload: BasePayload):
-            return Action(event='new_message_notification', system=event['system'], params=payload.to_data())
+    async def notification_counters(self, event):
+        async def action_for_target(message: Message, payload: BasePayload):
+            return Action(event='notification_counters', system=event['system'],
+                          params={'counters': await self.unread_counts(message.user)})
 
-        self.send_broadcast(event, action_for_target=action_for_target, target=TargetsEnum.for_user)
+        await self.send_broadcast(event, action_for_target=action_for_target, target=TargetsEnum.for_user)
@@ -0,0 +1,131 @@
+"""
+Websocket: Outbound
+====================================
+Bounded per-connection queues of outgoing frames
+
+Consumers put frames into their queue and return, a writer task sends them to the client,
+so a slow client only fills its own queue instead of its channel layer inbox shared with group sends
+
+ASGI servers accept frames without waiting for the socket, so the writer only knows a client is slow from acks:
+clients send ``{"event": "ack", "params": {"received": <frames received so far>}}`` on open and every few frames,
+then at most :attr:`OutboundQueue.window` frames are unacknowledged and the rest wait in the queue.
+Clients that never ack are not bounded, their frames pile up in the server's transport buffer
+"""
+import asyncio
+import weakref
+from collections import deque
+
+from django.conf import settings
+
+
+class OutboundPolicy:
+    """What a full queue does with a new frame"""
+    drop_oldest = 'drop_oldest'  #: Drop the oldest queued frame
+    coalesce = 'coalesce'  #: Replace queued frame of the same key, drop the oldest frame if there is none
+    disconnect = 'disconnect'  #: Close the slow connection
+
+    choices = (drop_oldest, coalesce, disconnect)
+
+
+SLOW_CONSUMER_CLOSE_CODE = 1013  #: Try again later
+
+
+class OutboundMetrics:
+    """Counters of every outbound queue in the process"""
+
+    def __init__(self):
+        self.sent = 0
+        self.dropped = 0  #: Frames dropped from full queues
+        self.coalesced = 0  #: Frames replaced by newer frames of the same key
+        self.disconnects = 0  #: Connections closed by :obj:`OutboundPolicy.disconnect`
+        self.max_depth = 0  #: Deepest queue seen
+        self.queues = weakref.WeakSet()
+
+    def stats(self) -> dict:
+        queues = list(self.queues)
+        depths = [len(queue) for queue in queues]
+        return {
+            'queues': len(depths),
+            'acking': sum(1 for queue in queues if queue.acked is not None),
+            'unacked': sum(queue.unacked for queue in queues),
+            'depth': sum(depths),
+            'deepest': max(depths, default=0),
+            'max_depth': self.max_depth,
+            'sent': self.sent,
+            'dropped': self.dropped,
+            'coalesced': self.coalesced,
+            'disconnects': self.disconnects,
+        }
+
+
+metrics = OutboundMetrics()
+
+
+class OutboundQueue:
+    """
+    Frames of one connection, ``send`` kwargs of the websocket consumer with optional coalescing key
+
+    Frames without key are never coalesced, only dropped
+    """
+
+    def __init__(self, maxsize: int = 100, policy: str = OutboundPolicy.coalesce, window: int = 50):
+        if policy not in OutboundPolicy.choices:
+            raise ValueError(f'Unknown outbound policy {policy}, expected one of {", ".join(OutboundPolicy.choices)}')
+        self.maxsize = maxsize
+        self.policy = policy
+        self.window = window  #: Max frames sent but not acknowledged by the client
+        self.sent = 0
+        self.acked = None  #: Frames acknowledged by the client, ``None`` until its first ack
+        self._frames = deque()
+        self._ready = asyncio.Event()
+        metrics.queues.add(self)
+
+    def __len__(self):
+        return len(self._frames)
+
+    def put(self, frame: dict, key: str = None) -> bool:
+        """Queue frame, ``False`` when the connection is too slow and should be closed"""
+        if self.policy == OutboundPolicy.coalesce and key is not None:
+            for i, (queued_key, _) in enumerate(self._frames):
+                if queued_key == key:
+                    del self._frames[i]
+                    metrics.coalesced += 1
+                    break
+        if len(self._frames) >= self.maxsize:
+            if self.policy == OutboundPolicy.disconnect:
+                metrics.disconnects += 1
+                return False
+            self._frames.popleft()
+            metrics.dropped += 1
+        self._frames.append((key, frame))
+        metrics.max_depth = max(metrics.max_depth, len(self._frames))
+        self._ready.set()
+        return True
+
+    @property
+    def unacked(self) -> int:
+        return self.sent - self.acked if self.acked is not None else 0
+
+    def ack(self, received: int):
+        """Client received this many frames since connect, releases frames held by :attr:`window`"""
+        self.acked = max(self.acked or 0, min(int(received), self.sent))
+        self._ready.set()
+
+    async def get(self) -> dict:
+        """Next frame, waits while the queue is empty or the client is :attr:`window` frames behind"""
+        while not self._frames or self.unacked >= self.window:
+            self._ready.clear()
+            await self._ready.wait()
+        self.sent += 1
+        return self._frames.popleft()[1]
+
+    def clear(self):
+        self._frames.clear()
+
+
+def outbound_queue() -> OutboundQueue:
+    return OutboundQueue(
+        maxsize=getattr(settings, 'WS_OUTBOUND_QUEUE_SIZE', 100),
+        policy=getattr(settings, 'WS_OUTBOUND_POLICY', OutboundPolicy.coalesce),
+        window=getattr(settings, 'WS_OUTBOUND_WINDOW', 50)
+    )
@@ -0,0 +1,132 @@
+"""
+Websocket: Presence
+====================================
+Live channels of every user inside each broadcast group
+
+With the redis cache every user has a sorted set of channels scored by expiry time in the cache database,
+so processes add and remove their own channels without rewriting those of others.
+Other caches are local to one process, so channels are kept in process memory as well
+
+Consumers register their channel on connect, refresh it with heartbeats and drop it on disconnect,
+channels of crashed servers expire after :attr:`Presence.ttl` without heartbeats
+"""
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+def redis_client():
+    """Client of the redis cache, ``None`` for other cache backends"""
+    client = getattr(cache, 'client', None)  # django-redis
+    if hasattr(client, 'get_client'):
+        return client.get_client(write=True)
+    client = getattr(cache, '_cache', None)  # Django 4+ RedisCache
+    if hasattr(client, 'get_client'):
+        return client.get_client(write=True)
+    return None
+
+
+class Presence:
+    """
+    Registry of live channels by broadcast group and user, ``{channel: expires}`` per user
+
+    ``is_online`` and ``channels`` are a single read, so signal handlers may check them on every event
+    """
+
+    def __init__(self, ttl: float = 90, heartbeat: float = 30, skip_offline: bool = True):
+        self.ttl = ttl  #: Seconds channel stays live without heartbeat
+        self.heartbeat = heartbeat  #: Seconds between heartbeats of a connected consumer
+        self.skip_offline = skip_offline  #: Skip realtime events of offline users, needs a cache shared by processes
+        self.connects = 0
+        self.disconnects = 0
+        self.heartbeats = 0
+        self.expired = 0  #: Channels dropped without disconnect
+        self.skipped = 0  #: Realtime events not sent to offline users
+        self._local = {}  #: Channels by key without redis cache
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(group: str, user_id: int) -> str:
+        return f'presence-{group}-{user_id}'
+
+    def _update(self, group: str, user_id: int, channel: str, live: bool):
+        key, now = self.key(group, user_id), time.time()
+        client = redis_client()
+        if client is not None:
+            key = cache.make_key(key)
+            pipe = client.pipeline(transaction=False)
+            if live:
+                pipe.zadd(key, {channel: now + self.ttl})
+                pipe.expire(key, math.ceil(self.ttl))
+            else:
+                pipe.zrem(key, channel)
+            pipe.zremrangebyscore(key, '-inf', now)
+            self.expired += pipe.execute()[-1]
+            return
+        with self._lock:
+            entries = self._local.get(key, {})
+            channels = {name: expires for name, expires in entries.items() if expires > now}
+            self.expired += len(entries) - len(channels)
+            if live:
+                channels[channel] = now + self.ttl
+            else:
+                channels.pop(channel, None)
+            if channels:
+                self._local[key] = channels
+            else:
+                self._local.pop(key, None)
+
+    def connect(self, group: str, user_id: int, channel: str):
+        self.connects += 1
+        self._update(group, user_id, channel, True)
+
+    def touch(self, group: str, user_id: int, channel: str):
+        """Heartbeat of a connected channel, registers it again when it has expired"""
+        self.heartbeats += 1
+        self._update(group, user_id, channel, True)
+
+    def disconnect(self, group: str, user_id: int, channel: str):
+        self.disconnects += 1
+        self._update(group, user_id, channel, False)
+
+    def channels(self, group: str, user_id: int) -> list:
+        """Live channels of user, the one with the latest heartbeat last"""
+        key, now = self.key(group, user_id), time.time()
+        client = redis_client()
+        if client is not None:
+            names = client.zrangebyscore(cache.make_key(key), now, '+inf')
+            return [name.decode() if isinstance(name, bytes) else name for name in names]
+        entries = self._local.get(key, {})
+        return [name for name, expires in sorted(entries.items(), key=lambda entry: entry[1]) if expires > now]
+
+    def is_online(self, group: str, user_id: int) -> bool:
+        return bool(self.channels(group, user_id))
+
+    def should_send(self, group: str, user_id: int) -> bool:
+        """Whether realtime events of user are worth sending, always ``True`` without :attr:`skip_offline`"""
+        if not self.skip_offline or self.is_online(group, user_id):
+            return True
+        self.skipped += 1
+        return False
+
+    def stats(self) -> dict:
+        return {
+            'ttl': self.ttl,
+            'heartbeat': self.heartbeat,
+            'skip_offline': self.skip_offline,
+            'connects': self.connects,
+            'disconnects': self.disconnects,
+            'heartbeats': self.heartbeats,
+            'expired': self.expired,
+            'skipped': self.skipped,
+        }
+
+
+presence = Presence(
+    ttl=getattr(settings, 'WS_PRESENCE_TTL', 90),
+    heartbeat=getattr(settings, 'WS_PRESENCE_HEARTBEAT', 30),
+    skip_offline=getattr(settings, 'WS_PRESENCE_SKIP_OFFLINE', True),
+)
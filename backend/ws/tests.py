@@ -0,0 +1,122 @@
+import asyncio
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import time
+import unittest
+
+import msgpack
+import redis
+from asgiref.sync import async_to_sync
+from channels.testing import WebsocketCommunicator
+from django.conf import settings
+from django.test import Client, TransactionTestCase, override_settings
+
+from forum.models import User
+from rush01.asgi import application
+from ws.base import ActionSystem, Action, encode_frames, user_group_name
+
+#: Sends one msgpack group event from stdin through the redis layer of a separate Django process
+SEND_EVENT = '''
+import sys
+
+import msgpack
+
+import django
+django.setup()
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+
+async_to_sync(get_channel_layer(sys.argv[1]).group_send)(sys.argv[2], msgpack.unpackb(sys.stdin.buffer.read()))
+'''
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+class RedisChannelLayerTest(TransactionTestCase):
+    """Consumers behind the redis channel layer receive events sent by another process, needs redis-server on PATH"""
+
+    @classmethod
+    def setUpClass(cls):
+        if not shutil.which('redis-server'):
+            raise unittest.SkipTest('redis-server is not on PATH')
+        port = free_port()
+        cls.redis = subprocess.Popen(['redis-server', '--port', str(port), '--save', '', '--appendonly', 'no'],
+                                     stdout=subprocess.DEVNULL)
+        cls.hosts = f'redis://127.0.0.1:{port}'
+        deadline = time.monotonic() + 10
+        while True:
+            try:
+                redis.Redis.from_url(cls.hosts).ping()
+                break
+            except redis.ConnectionError:
+                if time.monotonic() > deadline:
+                    cls.redis.kill()
+                    raise
+                time.sleep(0.05)
+        cls.layers = override_settings(CHANNEL_LAYERS={
+            alias: {'BACKEND': 'channels_redis.core.RedisChannelLayer',
+                    'CONFIG': {**layer.get('CONFIG', {}), 'hosts': [cls.hosts]}}
+            for alias, layer in settings.CHANNEL_LAYERS.items()
+        })
+        cls.layers.enable()
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls.layers.disable()
+        cls.redis.terminate()
+        cls.redis.wait()
+
+    def send_from_process(self, alias: str, group: str, event: dict):
+        subprocess.run(
+            [sys.executable, '-c', SEND_EVENT, alias, group], input=msgpack.packb(event),
+            cwd=settings.BASE_DIR, check=True, timeout=30,
+            env={**os.environ, 'DJANGO_SETTINGS_MODULE': 'rush01.settings', 'CHANNEL_LAYER': 'redis',
+                 'CHANNEL_REDIS_HOSTS': self.hosts},
+        )
+
+    def receive(self, path: str, user: User, alias: str, group: str, event: dict) -> dict:
+        client = Client()
+        client.force_login(user)
+        cookie = f'{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}'.encode()
+
+        async def receive():
+            communicator = WebsocketCommunicator(application, path, headers=[(b'cookie', cookie)])
+            connected, _ = await communicator.connect()
+            self.assertTrue(connected)
+            await asyncio.sleep(0.5)  # auth accepts before joining groups
+            await asyncio.get_running_loop().run_in_executor(None, self.send_from_process, alias, group, event)
+            try:
+                return await communicator.receive_json_from(timeout=10)
+            finally:
+                await communicator.disconnect()
+
+        return async_to_sync(receive)()
+
+    def test_chat_message(self):
+        author, recipient = User.objects.create_user('redis-author'), User.objects.create_user('redis-recipient')
+        params = {'id': 1, 'chat_id': 1, 'content': 'Across processes', 'to_user_id': recipient.id, 'time': ''}
+        frame = self.receive(f'/chat/{recipient.id}/', recipient, 'chat', user_group_name('chat', recipient.id), {
+            'type': 'message.send', 'params': params,
+            'system': ActionSystem(initiator_user_id=author.id).to_data(),
+        })
+        self.assertEqual(frame['event'], 'message_show')
+        self.assertEqual(frame['params']['content'], 'Across processes')
+
+    def test_post_notification(self):
+        user = User.objects.create_user('redis-reader')
+        params, system = {'title': 'Across processes'}, ActionSystem().to_data()
+        frame = self.receive(f'/notifications/{user.id}/', user, 'notifications', 'notifications', {
+            'type': 'post.created.notification', 'params': params, 'system': system,
+            'frames': encode_frames(Action(event='post_created_notification', system=system, params=params)),
+        })
+        self.assertEqual(frame, {'event': 'post_created_notification', 'params': params})
@@ -0,0 +1,172 @@
+"""
+Websocket: Users
+====================================
+In-process user lookup cache shared by consumers and websocket middleware
+
+Besides ``id`` and ``username`` users are looked up by ``session`` key, so handshakes of known sessions are free
+"""
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from importlib import import_module
+from types import SimpleNamespace
+from typing import Optional
+
+from channels.db import database_sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model, get_user, user_logged_out
+from django.db.models.signals import post_save, post_delete
+
+User = get_user_model()
+
+MISSING = object()  #: Returned by :func:`UserCache.lookup` when key is not cached
+
+
+class UserCache:
+    """
+    Bounded LRU cache with TTL for user lookups by ``id`` and ``username``
+
+    Missing users are cached too, every entry is dropped when the user is saved, deleted or logs out
+    """
+    fields = ('id', 'username', 'session')
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60):
+        self.maxsize = maxsize  #: Max cached lookups
+        self.ttl = ttl  #: Seconds before lookup goes to the database again
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0  #: Database lookups
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._user_keys = {}  #: User id to cached keys resolved to this user
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(field: str, value):
+        return field, int(value) if field == 'id' else str(value)
+
+    def lookup(self, field: str, value):
+        """Cached user, ``None`` for cached missing user or :obj:`MISSING`, never touches the database"""
+        try:
+            key = self._key(field, value)
+        except (TypeError, ValueError):
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] < time.monotonic():
+                self.misses += 1
+                return MISSING
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def get(self, field: str, value) -> Optional[User]:
+        user = self.lookup(field, value)
+        return self.load(field, value) if user is MISSING else user
+
+    def load(self, field: str, value) -> Optional[User]:
+        """Look user up in the database and cache the result"""
+        self.loads += 1
+        user = self.load_session(value) if field == 'session' else User.objects.filter(**{field: value}).first()
+        self.put(field, value, user)
+        return user
+
+    @staticmethod
+    def load_session(session_key: str) -> Optional[User]:
+        """User of the session like ``AuthenticationMiddleware`` resolves it, checking the session auth hash"""
+        session = import_module(settings.SESSION_ENGINE).SessionStore(session_key)
+        user = get_user(SimpleNamespace(session=session))
+        return None if user.is_anonymous else user
+
+    def get_by_id(self, user_id) -> Optional[User]:
+        return self.get('id', user_id)
+
+    def get_by_username(self, username: str) -> Optional[User]:
+        return self.get('username', username)
+
+    def get_by_session(self, session_key: str) -> Optional[User]:
+        return self.get('session', session_key)
+
+    def put(self, field: str, value, user: Optional[User]):
+        key = self._key(field, value)
+        with self._lock:
+            self._entries[key] = (user, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            if user is not None:
+                self._user_keys.setdefault(user.id, set()).add(key)
+            while len(self._entries) > self.maxsize:
+                self._drop(*self._entries.popitem(last=False))
+                self.evictions += 1
+
+    def _drop(self, key, entry):
+        user = entry[0]
+        if user is not None and user.id in self._user_keys:
+            self._user_keys[user.id].discard(key)
+            if not self._user_keys[user.id]:
+                del self._user_keys[user.id]
+
+    def invalidate(self, user: User):
+        with self._lock:
+            keys = self._user_keys.pop(user.id, set())
+            keys |= {self._key('id', user.id), self._key('username', user.username)}
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._user_keys.clear()
+
+    def stats(self) -> dict:
+        requests = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'maxsize': self.maxsize,
+            'ttl': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'loads': self.loads,
+            'evictions': self.evictions,
+            'hit_ratio': round(self.hits / requests, 4) if requests else None,
+        }
+
+
+user_cache = UserCache(
+    maxsize=getattr(settings, 'WS_USER_CACHE_SIZE', 1024),
+    ttl=getattr(settings, 'WS_USER_CACHE_TTL', 60)
+)
+
+
+_loading = {}  #: Database lookups in progress by key, shared by every coroutine waiting for the same user
+
+
+async def get_user_async(field: str, value) -> Optional[User]:
+    """
+    Cached lookup for async code, the database is queried in a worker thread only on cache miss
+
+    Concurrent misses of the same key wait for a single lookup, so reconnect storms do not stampede the database
+    """
+    user = user_cache.lookup(field, value)
+    if user is not MISSING:
+        return user
+    key = (field, str(value))
+    loading = _loading.get(key)
+    if loading is None:
+        loading = _loading[key] = asyncio.ensure_future(database_sync_to_async(user_cache.load)(field, value))
+        loading.add_done_callback(lambda _: _loading.pop(key, None))
+    return await asyncio.shield(loading)
+
+
+def invalidate_user(instance, **kwargs):
+    user_cache.invalidate(instance)
+
+
+def invalidate_logged_out(user, **kwargs):
+    if user is not None:
+        user_cache.invalidate(user)
+
+
+post_save.connect(invalidate_user, sender=User, dispatch_uid='ws_user_cache_save')
+post_delete.connect(invalidate_user, sender=User, dispatch_uid='ws_user_cache_delete')
+user_logged_out.connect(invalidate_logged_out, dispatch_uid='ws_user_cache_logout')
@@ -0,0 +1,14 @@
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import JsonResponse
+
+from forum.outbox import dispatcher
+
+from .outbound import metrics as outbound_metrics
+from .presence import presence
+from .users import user_cache
+
+
+@staff_member_required
+def stats(request):
+    return JsonResponse({'user_cache': user_cache.stats(), 'presence': presence.stats(),
+                         'outbound': outbound_metrics.stats(), 'outbox': dispatcher.stats()})